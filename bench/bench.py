@@ -0,0 +1,382 @@
+from PIL import Image, ImageDraw
+import argparse
+import io
+import json
+import os
+import platform
+import random
+import statistics
+import subprocess
+import sys
+import time
+
+ROOT = os.path.dirname(os.path.dirname(os.path.abspath(__file__)))
+sys.path.insert(0, os.path.join(ROOT, "v2"))
+sys.path.insert(0, os.path.join(ROOT, "main"))
+
+import PIL
+from atlas import glyph_atlas
+from content import Chapter
+from fitting import font_fitter
+from fonts import font_registry, get_font
+from layout import PageLayout
+from metrics import text_metrics
+from raster import rasterize
+from tiles import TiledRasterizer
+from toc_gen import Page
+from wrapping import line_breaker
+
+LATIN = "abcdefghijklmnopqrstuvwxyz"
+CYRILLIC = "абвгдеёжзийклмнопрстуфхцчшщъыьэюя"
+CJK = "的一是不了人我在有他这中大来上国个到说们为子和你地出道也时年得就那要下以生会自着去之过家学对可她里后小么心多天而能好都然没日于起还发成事只作当想看文无开手十用主行方又如前所本见经头面公同三已老从动两长"
+FULLWIDTH = "！？：；，。（）＆＃"
+
+
+def create_console_args() -> argparse.Namespace:
+    """Creates an interface for requesting arguments from the console
+
+    Returns:
+        argparse.Namespace: entered arguments
+    """
+    parser = argparse.ArgumentParser(
+        description="Time measurement, layout, rasterization and encoding of both renderers on synthetic contents")
+    parser.add_argument("-c", '--chapters', default=[30, 300, 3000], nargs="+",
+                        help="Chapter counts to generate", type=int)
+    parser.add_argument("-r", '--repeat', default=3,
+                        help="Runs per case, the median is reported", type=int)
+    parser.add_argument("-f", '--font', default=os.path.join(ROOT, "v2", "fontick.otf"),
+                        help="Font used by every text", type=str)
+    parser.add_argument('--mix', default="latin",
+                        help="Script mix of the text: latin, cyrillic, cjk or mixed", type=str)
+    parser.add_argument('--title-words', default=[4, 2], nargs=2, metavar=("MEAN", "STDEV"),
+                        help="Distribution of words per chapter title", type=float)
+    parser.add_argument('--author-words', default=[2, 0.5], nargs=2, metavar=("MEAN", "STDEV"),
+                        help="Distribution of words per author name", type=float)
+    parser.add_argument('--renderer', default="all", choices=["all", "v2", "main", "tiled"],
+                        help="Which renderer to time, tiled compares drawing in bands with rasterize()")
+    parser.add_argument("-j", '--jobs', default=[2, 4], nargs="+",
+                        help="Process counts of the tiled case", type=int)
+    parser.add_argument('--format', default="JPEG",
+                        help="Pillow format used for the encoding phase", type=str)
+    parser.add_argument('--warm', action="store_true",
+                        help="Keep font and measurement caches between runs")
+    parser.add_argument('--seed', default=0, type=int)
+    parser.add_argument("-o", '--output',
+                        help="Write JSON lines here instead of stdout", type=str)
+    return parser.parse_args()
+
+
+def random_word(rng: random.Random, mix: str) -> str:
+    """Generates a word in the requested script mix
+
+    Args:
+        rng (random.Random): random generator
+        mix (str): latin, cyrillic, cjk or mixed
+
+    Returns:
+        str: word
+    """
+    if mix == "mixed":
+        mix = rng.choice(["latin", "latin", "cyrillic", "cjk"])
+    if mix == "cjk":
+        word = "".join(rng.choice(CJK) for _ in range(rng.randint(1, 4)))
+    else:
+        alphabet = CYRILLIC if mix == "cyrillic" else LATIN
+        word = "".join(rng.choice(alphabet) for _ in range(rng.randint(2, 9))).capitalize()
+    if rng.random() < 0.1:
+        word += rng.choice(FULLWIDTH)
+    return word
+
+
+def random_text(rng: random.Random, mix: str, mean: float, stdev: float) -> str:
+    """Generates a text with a normally distributed number of words
+
+    Args:
+        rng (random.Random): random generator
+        mix (str): latin, cyrillic, cjk or mixed
+        mean (float): mean number of words
+        stdev (float): standard deviation of the number of words
+
+    Returns:
+        str: text
+    """
+    words = max(1, round(rng.gauss(mean, stdev)))
+    return " ".join(random_word(rng, mix) for _ in range(words))
+
+
+def synthetic_toc(chapters: int, mix: str, title_words: list, author_words: list, seed: int = 0) -> dict:
+    """Generates a contents json with the given shape
+
+    Args:
+        chapters (int): number of chapters
+        mix (str): latin, cyrillic, cjk or mixed
+        title_words (list): [mean, stdev] of words per title
+        author_words (list): [mean, stdev] of words per author
+        seed (int): seed of the generator
+
+    Returns:
+        dict: {"title", "chapters"}
+    """
+    rng = random.Random(seed)
+    page = 1
+    content = {"title": random_text(rng, mix, 3, 1), "chapters": list()}
+    for _ in range(chapters):
+        content["chapters"].append({"title": random_text(rng, mix, *title_words),
+                                    "author": random_text(rng, mix, *author_words),
+                                    "pages": page})
+        page += rng.randint(2, 40)
+    return content
+
+
+def v2_settings(font: str, two_columns: bool, auto: bool, mirror: bool) -> dict:
+    """Builds v2 settings for one variant from v2/settings.json
+
+    Args:
+        font (str): font used by every text
+        two_columns (bool): use_two_columns
+        auto (bool): "auto" resolution or a fixed A4 page
+        mirror (bool): mirror_columns
+
+    Returns:
+        dict: settings
+    """
+    with open(os.path.join(ROOT, "v2", "settings.json"), "r", encoding="utf-8") as f:
+        settings: dict = json.loads(f.read())
+    for section in (settings["title"], settings["subtitle"], settings["content"]["author"],
+                    settings["content"]["title"], settings["content"]["page_number"]):
+        section["font"] = font
+    settings["page"]["resolution"] = ["auto", "auto"] if auto else [2480, 3508]
+    settings["content"]["style"]["use_two_columns"] = two_columns
+    settings["content"]["style"]["mirror_columns"] = mirror
+    return settings
+
+
+def main_settings(font: str) -> dict:
+    """Builds settings in the main/toc_gen.py format
+
+    Args:
+        font (str): font used by every text
+
+    Returns:
+        dict: settings
+    """
+    text = {"font": font, "font_size": 40, "min_font_size": 30, "font_color": "#000000"}
+    return {"resolution": [1240, 1754], "color": "#FFFFFF", "side_borders": 10,
+            "title": dict(text, font_size=55, min_font_size=40, gap=80),
+            "subtitle": dict(text, text="content", font_size=50, gap=70),
+            "content": {"gap_top": 40, "author": dict(text, font_size=30, min_font_size=20),
+                        "author_to_title_distance": 10, "title": dict(text),
+                        "title_to_pages_distance": 10, "pages": dict(text, font_size=35),
+                        "title_to_author_distance": 10}}
+
+
+def clear_caches() -> None:
+    """Forgets loaded fonts, measurements, glyphs and wrapped texts so every run starts cold
+    """
+    font_registry.clear()
+    glyph_atlas.clear()
+    text_metrics.clear()
+    font_fitter.clear()
+    line_breaker.clear()
+
+
+def encode(img: Image.Image, image_format: str) -> int:
+    """Encodes the image in memory
+
+    Args:
+        img (Image.Image): rendered page
+        image_format (str): Pillow format
+
+    Returns:
+        int: encoded size in bytes
+    """
+    buffer = io.BytesIO()
+    img.save(buffer, format=image_format)
+    return buffer.tell()
+
+
+def time_v2(content: dict, settings: dict, image_format: str) -> dict:
+    """Times one render of v2 split by phase
+
+    Args:
+        content (dict): contents json
+        settings (dict): v2 settings
+        image_format (str): Pillow format
+
+    Returns:
+        dict: seconds per phase, canvas size and encoded bytes
+    """
+    chapters = [Chapter.from_dict(chapter) for chapter in content["chapters"]]
+    started = time.perf_counter()
+    page_layout = PageLayout(content["title"], chapters, settings)
+    measured = time.perf_counter()
+    layout = page_layout.layout_page()
+    laid_out = time.perf_counter()
+    img = rasterize(layout)
+    rasterized = time.perf_counter()
+    size = encode(img, image_format)
+    encoded = time.perf_counter()
+    return {"measurement": measured - started, "layout": laid_out - measured,
+            "rasterization": rasterized - laid_out, "encoding": encoded - rasterized,
+            "canvas": list(img.size), "bytes": size}
+
+
+def time_main(content: dict, settings: dict, image_format: str) -> dict:
+    """Times one render of main/toc_gen.py split by phase
+
+    Page lays out and draws in the same methods, so layout and
+    rasterization are reported together as "draw".
+
+    Args:
+        content (dict): contents json
+        settings (dict): main/toc_gen.py settings
+        image_format (str): Pillow format
+
+    Returns:
+        dict: seconds per phase, canvas size and encoded bytes
+    """
+    page = Page.__new__(Page)
+    page.info = {"title": content["title"],
+                 "chapters": [Chapter.from_dict(chapter) for chapter in content["chapters"]]}
+    page.settings = settings
+    started = time.perf_counter()
+    page.get_longest_line(get_font(settings["content"]["title"]["font"], settings["content"]["title"]["font_size"]), "title")
+    page.get_longest_line(get_font(settings["content"]["pages"]["font"], settings["content"]["pages"]["font_size"]), "pages")
+    measured = time.perf_counter()
+    page.img = Image.new("RGB", settings["resolution"], color=settings["color"])
+    page.draw_text = ImageDraw.Draw(page.img)
+    page.draw_titles()
+    page.draw_content()
+    drawn = time.perf_counter()
+    size = encode(page.img, image_format)
+    encoded = time.perf_counter()
+    return {"measurement": measured - started, "draw": drawn - measured, "encoding": encoded - drawn,
+            "canvas": list(page.img.size), "bytes": size}
+
+
+def time_tiled(content: dict, settings: dict, jobs: int) -> dict:
+    """Times rasterize() against drawing the same page in bands on a pool of worker processes
+
+    Both are timed with warm caches. The first tiled draw starts the pool
+    and is reported on its own, later draws reuse it as the pages of a
+    paginated render do.
+
+    Args:
+        content (dict): contents json
+        settings (dict): v2 settings
+        jobs (int): number of worker processes
+
+    Returns:
+        dict: seconds of the serial, first tiled and tiled draws, canvas size and processes used
+    """
+    chapters = [Chapter.from_dict(chapter) for chapter in content["chapters"]]
+    layout = PageLayout(content["title"], chapters, settings).layout_page()
+    rasterize(layout)
+    started = time.perf_counter()
+    expected = rasterize(layout)
+    serial = time.perf_counter()
+    with TiledRasterizer(jobs) as rasterizer:
+        rasterizer.rasterize(layout)
+        first = time.perf_counter()
+        img = rasterizer.rasterize(layout)
+        tiled = time.perf_counter()
+        processes = rasterizer.processes
+    if img.tobytes() != expected.tobytes():
+        raise RuntimeError("the tiled page differs from rasterize()")
+    return {"serial": serial - started, "first": first - serial, "tiled": tiled - first,
+            "canvas": list(img.size), "processes": processes}
+
+
+def run_tiled_case(content: dict, settings: dict, jobs: int, args: argparse.Namespace) -> dict:
+    """Runs the tiled case args.repeat times and keeps the medians and the speedup over rasterize()
+
+    Args:
+        content (dict): contents json
+        settings (dict): v2 settings
+        jobs (int): number of worker processes
+        args (argparse.Namespace): console arguments
+
+    Returns:
+        dict: median seconds, speedup of the tiled draw, canvas size and processes used
+    """
+    runs = list()
+    for _ in range(args.repeat):
+        if not args.warm:
+            clear_caches()
+        runs.append(time_tiled(content, settings, jobs))
+    result = {"canvas": runs[0]["canvas"], "processes": runs[0]["processes"]}
+    result["seconds"] = {phase: statistics.median(run[phase] for run in runs) for phase in ("serial", "first", "tiled")}
+    result["speedup"] = result["seconds"]["serial"] / result["seconds"]["tiled"]
+    return result
+
+
+def run_case(timer, content: dict, settings: dict, args: argparse.Namespace) -> dict:
+    """Runs a case args.repeat times and keeps the median of every phase
+
+    Args:
+        timer: time_v2 or time_main
+        content (dict): contents json
+        settings (dict): settings of the renderer
+        args (argparse.Namespace): console arguments
+
+    Returns:
+        dict: median seconds per phase, canvas size and encoded bytes
+    """
+    runs = list()
+    for _ in range(args.repeat):
+        if not args.warm:
+            clear_caches()
+        runs.append(timer(content, settings, args.format))
+    result = {key: value for key, value in runs[0].items() if not isinstance(value, float)}
+    phases = [key for key, value in runs[0].items() if isinstance(value, float)]
+    result["seconds"] = {phase: statistics.median(run[phase] for run in runs) for phase in phases}
+    result["seconds"]["total"] = sum(result["seconds"].values())
+    return result
+
+
+def environment() -> dict:
+    """Describes where the benchmark ran, so results of different commits can be compared
+
+    Returns:
+        dict: commit, python and pillow versions, machine
+    """
+    try:
+        commit = subprocess.run(["git", "rev-parse", "HEAD"], cwd=ROOT, capture_output=True,
+                                text=True).stdout.strip() or None
+    except OSError:
+        commit = None
+    return {"commit": commit, "python": platform.python_version(), "pillow": PIL.__version__,
+            "machine": platform.machine(), "processor": platform.processor(), "cpus": os.cpu_count()}
+
+
+if __name__ == "__main__":
+    args = create_console_args()
+    output = open(args.output, "w", encoding="utf-8") if args.output else sys.stdout
+    meta = environment()
+    meta.update(mix=args.mix, title_words=args.title_words, author_words=args.author_words,
+                repeat=args.repeat, warm=args.warm, format=args.format)
+    print(json.dumps({"environment": meta}), file=output)
+
+    for chapters in args.chapters:
+        content = synthetic_toc(chapters, args.mix, args.title_words, args.author_words, args.seed)
+        if args.renderer in ("all", "v2"):
+            for two_columns in (False, True):
+                for auto in (True, False):
+                    for mirror in (False, True):
+                        settings = v2_settings(args.font, two_columns, auto, mirror)
+                        result = {"renderer": "v2", "chapters": chapters, "two_columns": two_columns,
+                                  "resolution": "auto" if auto else "fixed", "mirror_columns": mirror}
+                        result.update(run_case(time_v2, content, settings, args))
+                        print(json.dumps(result), file=output, flush=True)
+        if args.renderer in ("all", "main"):
+            result = {"renderer": "main", "chapters": chapters}
+            result.update(run_case(time_main, content, main_settings(args.font), args))
+            print(json.dumps(result), file=output, flush=True)
+        if args.renderer in ("all", "tiled"):
+            for jobs in args.jobs:
+                result = {"renderer": "tiled", "chapters": chapters, "jobs": jobs}
+                result.update(run_tiled_case(content, v2_settings(args.font, True, False, False), jobs, args))
+                print(json.dumps(result), file=output, flush=True)
+
+    if output is not sys.stdout:
+        output.close()
@@ -5,6 +5,12 @@ import sys
 import os
 import argparse
 
+sys.path.append(os.path.join(os.path.dirname(os.path.abspath(__file__)), "..", "v2"))
+from content import read_content
+from fonts import get_font
+from metrics import text_metrics
+from wrapping import line_breaker
+
 class Page():
 
     def __init__(self) -> None:
@@ -16,8 +22,8 @@ class Page():
         args = parser.parse_args() 
         self.check_console_args(args)
 
-        with open(args.input, "r", encoding="utf-8") as f:
-            self.info:dict = json.loads(f.read())
+        title, chapters = read_content(args.input)
+        self.info:dict = {"title": title, "chapters": chapters}
 
         with open(args.settings, "r", encoding="utf-8") as f:
             self.settings:dict = json.loads(f.read())
@@ -52,10 +58,7 @@ class Page():
 
 
     def text_size(self, text:str, font:ImageFont.ImageFont, is_list:bool = False)-> int:
-        text = str(text)
-        width = font.getmask(text).getbbox()[2]
-        height = font.getmask(text).getbbox()[3]
-        return [width, height]
+        return text_metrics.text_size(text, font)
 
 
 
@@ -68,25 +71,8 @@ class Page():
 
 
     def resize(self, max_width:int, text:str, settings:dict):
-        font = ImageFont.truetype(settings["font"], size = settings["font_size"])
-        if max_width > self.text_size(text, font)[0]:
-            return [text, font]
-        else:
-            for font_kegel in range(settings["font_size"] - settings["min_font_size"]):
-                    font = ImageFont.truetype("roboto_regular.otf", size = settings["font_size"] - font_kegel)
-                    if max_width > self.text_size(text, font)[0]:
-                        return [text, font]
-            
-            words_list = text.split(" ")
-            temp_line = ""
-            for word in words_list:
-                temp_line = temp_line + word + " "
-                if self.text_size(temp_line, font)[0] >= max_width:
-                    temp_line = temp_line.strip()
-                    temp_line = temp_line[:temp_line.rfind(" ")]
-                    text = temp_line + "\n" + text[len(temp_line) + 1:]
-                    return [text, font]
-            
+        return line_breaker.wrap(text, settings["font"], settings["font_size"], settings["min_font_size"], max_width, settings.get("wrap", "greedy"))
+
 
     def draw_titles(self):
         height = self.settings["title"]["gap"]
@@ -110,8 +96,8 @@ class Page():
         page_num_fill = self.settings["content"]["pages"]["font_color"]
 
         #vertical_distance = 15
-        block_width = self.get_longest_line(ImageFont.truetype(self.settings["content"]["title"]["font"], size = self.settings["content"]["title"]["font_size"]), "title")
-        page_block = self.get_longest_line(ImageFont.truetype(self.settings["content"]["pages"]["font"], size = self.settings["content"]["pages"]["font_size"]), "pages") + self.settings["content"]["title_to_pages_distance"]
+        block_width = self.get_longest_line(get_font(self.settings["content"]["title"]["font"], size = self.settings["content"]["title"]["font_size"]), "title")
+        page_block = self.get_longest_line(get_font(self.settings["content"]["pages"]["font"], size = self.settings["content"]["pages"]["font_size"]), "pages") + self.settings["content"]["title_to_pages_distance"]
         block_width += page_block
         if block_width > self.settings["resolution"][0] - self.settings["side_borders"]*2:
             block_width = self.settings["resolution"][0] - self.settings["side_borders"]*2
@@ -128,7 +114,7 @@ class Page():
             self.draw_text.multiline_text((left_border+block_width-autor_width-page_block, self.temp_height),author, font=author_font, fill = autor_fill)
             self.temp_height += autor_height + self.settings["content"]["author_to_title_distance"]
 
-            page_font = ImageFont.truetype(self.settings["content"]["pages"]["font"], self.settings["content"]["pages"]["font_size"])
+            page_font = get_font(self.settings["content"]["pages"]["font"], self.settings["content"]["pages"]["font_size"])
             page_width, page_height = self.text_size(pages, page_font)
             self.draw_text.text((left_border+block_width-page_width, self.temp_height),pages, font=page_font, fill = page_num_fill)
             
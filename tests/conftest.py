@@ -0,0 +1,46 @@
+import copy
+import json
+import os
+import sys
+
+import pytest
+
+ROOT = os.path.dirname(os.path.dirname(os.path.abspath(__file__)))
+sys.path.insert(0, os.path.join(ROOT, "v2"))
+
+FONT = os.path.join(ROOT, "v2", "fontick.otf")
+
+
+def use_local_fonts(settings):
+    """Points every "font" of the settings at the font shipped with the repo"""
+    if isinstance(settings, dict):
+        for key, value in settings.items():
+            if key == "font":
+                settings[key] = FONT
+            else:
+                use_local_fonts(value)
+    return settings
+
+
+@pytest.fixture
+def settings() -> dict:
+    with open(os.path.join(ROOT, "v2", "settings.json"), "r", encoding="utf-8") as f:
+        return use_local_fonts(json.load(f))
+
+
+@pytest.fixture
+def content() -> dict:
+    with open(os.path.join(ROOT, "v2", "toc.json"), "r", encoding="utf-8") as f:
+        toc = json.load(f)
+    return {"title": toc["title"], "chapters": toc["chapters"][:12]}
+
+
+@pytest.fixture
+def write_json(tmp_path):
+    """Writes a dict into tmp_path and returns the path"""
+    def write(name: str, data: dict) -> str:
+        path = str(tmp_path / name)
+        with open(path, "w", encoding="utf-8") as f:
+            json.dump(copy.deepcopy(data), f, ensure_ascii=False)
+        return path
+    return write
@@ -0,0 +1,53 @@
+import io
+
+import pytest
+from PIL import Image
+
+import api
+from optimizer import build_layout
+from raster import rasterize
+from content import Chapter
+
+
+def test_image_raw_and_encoded_pages_agree(content, settings):
+    img = api.render_image(content, settings)
+    chapters = [Chapter.from_dict(chapter) for chapter in content["chapters"]]
+    assert img.tobytes() == rasterize(build_layout(content["title"], chapters, settings)).tobytes()
+
+    raw = api.render_raw(content, settings)
+    assert raw.pixels.shape == (img.size[1], img.size[0], 3) and raw.pixels.readonly
+    assert raw.pixels.tobytes() == img.tobytes()
+    assert raw.to_image().tobytes() == img.tobytes()
+
+    buffer = io.BytesIO()
+    assert api.render_into(buffer, content, settings, "png") == "image/png"
+    buffer.seek(0)
+    assert Image.open(buffer).tobytes() == img.tobytes()
+
+    buffer = io.BytesIO()
+    assert api.render_into(buffer, content, settings, "svg") == "image/svg+xml"
+    assert buffer.getvalue().startswith(b"<svg")
+
+
+def test_paginated_pages_are_yielded_one_by_one(content, settings):
+    settings["page"]["paginate"] = True
+    settings["page"]["resolution"] = [800, 900]
+    pages = list(api.render_pages(content, settings))
+    assert len(pages) > 1 and all(page.size == (800, 900) for page in pages)
+    with pytest.raises(ValueError):
+        api.render_image(content, settings)
+
+
+@pytest.mark.parametrize("change", ["contents", "section", "font", "format"])
+def test_invalid_input_raises_value_error(content, settings, change):
+    image_format = "png"
+    if change == "contents":
+        content = {"chapters": []}
+    elif change == "section":
+        del settings["space"]
+    elif change == "font":
+        settings["title"]["font"] = "/missing/font.otf"
+    else:
+        image_format = "nonsense"
+    with pytest.raises(ValueError):
+        api.render_into(io.BytesIO(), content, settings, image_format)
@@ -0,0 +1,23 @@
+import os
+
+from PIL import Image, ImageDraw
+
+from atlas import GlyphAtlas
+from fonts import get_font
+
+FONT = os.path.join(os.path.dirname(os.path.dirname(os.path.abspath(__file__))), "v2", "fontick.otf")
+
+LINES = ["Let Me In？", "Тёмная сторона, часть 2", "AVATAR ff fi WAVE", "1234567890", "two\nlines here"]
+
+
+def test_atlas_draws_the_pixels_pillow_draws():
+    atlas = GlyphAtlas()
+    for size in (12, 30, 50):
+        font = get_font(FONT, size)
+        for text in LINES:
+            expected = Image.new("RGB", (900, 160), "#FFFFFF")
+            ImageDraw.Draw(expected).multiline_text((5, 7), text, font=font, fill="#A30008", align="right")
+            drawn = Image.new("RGB", (900, 160), "#FFFFFF")
+            atlas.draw_text(ImageDraw.Draw(drawn), (5, 7), text, font, "#A30008", "right")
+            assert drawn.tobytes() == expected.tobytes(), (size, text)
+    assert atlas.stats()["misses"] > 0
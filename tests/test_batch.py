@@ -0,0 +1,27 @@
+import json
+import os
+import subprocess
+import sys
+
+ROOT = os.path.dirname(os.path.dirname(os.path.abspath(__file__)))
+
+
+def test_stats_with_a_failing_job(tmp_path, content, settings, write_json):
+    inputs = tmp_path / "inputs"
+    inputs.mkdir()
+    write_json("inputs/good.json", content)
+    (inputs / "broken.json").write_text("{\"title\": ", encoding="utf-8")
+    settings_path = write_json("settings.json", settings)
+    report_path = tmp_path / "report.json"
+
+    finished = subprocess.run([sys.executable, os.path.join(ROOT, "v2", "batch.py"), "-i", str(inputs),
+                               "-o", str(tmp_path), "-s", settings_path, "-f", "png", "-j", "1",
+                               "--stats", str(report_path)], capture_output=True, text=True)
+    assert finished.returncode == 1, finished.stderr
+    assert "Traceback" not in finished.stderr
+    assert "Rendered 1 of 2 pages" in finished.stdout
+    assert os.path.exists(tmp_path / "good.png")
+    with open(report_path, "r", encoding="utf-8") as f:
+        report = json.load(f)
+    assert report["renders"] == 1
+    assert report["phases"]["json_load"]["calls"] == 1
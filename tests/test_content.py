@@ -0,0 +1,61 @@
+import json
+
+import pytest
+
+from content import Chapter, ContentStream, read_content
+
+VALID = [
+    '{"title": "Том", "chapters": [{"title": "A, [b]", "author": "c}", "pages": 1}, {"title": "d", "pages": "2-3"}]}',
+    '{"chapters": [], "title": "empty"}',
+    ' { "extra" : {"nested": [1, {"x": "]"}]} , "title" : "t" , "chapters" : [ {"title": "only", "realPages": 9} ] } \n',
+    '{"title": "no chapters"}',
+]
+
+INVALID = [
+    '{"title": "t", "chapters": [{"title": "a"}{"title": "b"}]}',
+    '{"title": "t" "chapters": []}',
+    '{"title": "t", "chapters": [{"title": "a"},]}',
+    '{"title": "t",}',
+    '{"title": "t", "chapters": [{"title": "a"}]',
+    '{"title": "t", "chapters": []} {}',
+    '{1: "t"}',
+    '',
+]
+
+
+def write(tmp_path, text: str) -> str:
+    path = tmp_path / "toc.json"
+    path.write_text(text, encoding="utf-8")
+    return str(path)
+
+
+@pytest.mark.parametrize("text", VALID)
+@pytest.mark.parametrize("chunk_size", [1, 7, 1 << 16])
+def test_valid_documents_match_json_load(tmp_path, text, chunk_size):
+    expected = json.loads(text)
+    stream = ContentStream(write(tmp_path, text), chunk_size)
+    chapters = list(stream)
+    assert stream.title == expected.get("title")
+    assert chapters == [Chapter.from_dict(chapter) for chapter in expected.get("chapters", [])]
+
+
+@pytest.mark.parametrize("text", INVALID)
+@pytest.mark.parametrize("chunk_size", [1, 1 << 16])
+def test_invalid_documents_are_rejected_like_json_load(tmp_path, text, chunk_size):
+    with pytest.raises(json.JSONDecodeError):
+        json.loads(text)
+    with pytest.raises(json.JSONDecodeError):
+        list(ContentStream(write(tmp_path, text), chunk_size))
+
+
+def test_read_content_matches_json_load_for_json_lines(tmp_path):
+    path = tmp_path / "toc.jsonl"
+    path.write_text('{"title": "t"}\n\n{"title": "a", "author": "b", "pages": 1}\n', encoding="utf-8")
+    assert read_content(str(path)) == ["t", [Chapter("a", "b", 1)]]
+
+
+def test_chapter_get_reads_only_fields():
+    chapter = Chapter("a", "b", 3)
+    assert chapter.get("title") == "a" and chapter.get("pages") == 3
+    assert chapter.get("count") is None and chapter.get("index", 0) == 0
+    assert chapter.get("realPages", 5) == 5
@@ -0,0 +1,63 @@
+import argparse
+import copy
+import os
+
+from PIL import Image
+
+import main
+
+
+def render(tmp_path, content, settings_path, write_json, incremental, name="page.png"):
+    args = argparse.Namespace(input=write_json("toc.json", content), settings=settings_path,
+                              output=str(tmp_path), name=name, incremental=incremental)
+    page = main.Create_content_page(args)
+    with Image.open(os.path.join(tmp_path, name)) as img:
+        return page.incremental, img.tobytes()
+
+
+def test_changed_row_is_repainted(tmp_path, content, settings, write_json):
+    settings_path = write_json("settings.json", settings)
+    result, _ = render(tmp_path, content, settings_path, write_json, True)
+    assert result["mode"] == "full"
+    assert render(tmp_path, content, settings_path, write_json, True)[0]["mode"] == "unchanged"
+
+    changed = copy.deepcopy(content)
+    changed["chapters"][3]["pages"] = 58
+    result, pixels = render(tmp_path, changed, settings_path, write_json, True)
+    assert result["mode"] == "partial"
+    assert pixels == render(tmp_path, changed, settings_path, write_json, False, "full.png")[1]
+
+
+def test_page_overwritten_by_a_plain_render_is_rendered_in_full(tmp_path, content, settings, write_json):
+    settings_path = write_json("settings.json", settings)
+    render(tmp_path, content, settings_path, write_json, True)
+    other = copy.deepcopy(content)
+    other["chapters"][5]["pages"] = 102
+    render(tmp_path, other, settings_path, write_json, False)
+
+    changed = copy.deepcopy(content)
+    changed["chapters"][3]["pages"] = 58
+    result, pixels = render(tmp_path, changed, settings_path, write_json, True)
+    assert result["mode"] == "full"
+    assert pixels == render(tmp_path, changed, settings_path, write_json, False, "full.png")[1]
+
+
+def test_variants_are_saved_from_the_repainted_page(tmp_path, content, settings, write_json):
+    settings["output"] = {"variants": [{"format": "PNG", "suffix": "_small", "width": 200},
+                                       {"format": "JPEG", "suffix": "_web", "quality": 80}]}
+    settings_path = write_json("settings.json", settings)
+    render(tmp_path, content, settings_path, write_json, True)
+    changed = copy.deepcopy(content)
+    changed["chapters"][3]["pages"] = 58
+    result, _ = render(tmp_path, changed, settings_path, write_json, True)
+    assert result["mode"] == "partial"
+
+    plain = tmp_path / "plain"
+    plain.mkdir()
+    args = argparse.Namespace(input=write_json("changed.json", changed), settings=settings_path,
+                              output=str(plain), name="page.png", incremental=False)
+    main.Create_content_page(args)
+    for suffix in ("_small.png", "_web.jpg"):
+        with Image.open(tmp_path / ("page" + suffix)) as img, Image.open(plain / ("page" + suffix)) as expected:
+            assert img.size == expected.size
+            assert img.tobytes() == expected.tobytes()
@@ -0,0 +1,68 @@
+import argparse
+import json
+import os
+
+import pytest
+
+import api
+import main
+from content import Chapter
+from optimizer import LayoutOptimizer, balance_columns, build_layout, prefix_sums
+
+ROOT = os.path.dirname(os.path.dirname(os.path.abspath(__file__)))
+
+
+def chapters(count: int) -> list:
+    with open(os.path.join(ROOT, "v2", "toc.json"), "r", encoding="utf-8") as f:
+        return [Chapter.from_dict(chapter) for chapter in json.load(f)["chapters"][:count]]
+
+
+def optimize(settings: dict, count: int, **style) -> LayoutOptimizer:
+    settings["page"]["resolution"] = [1240, 1754]
+    settings["content"]["style"].update(style)
+    optimizer = LayoutOptimizer("Contents", chapters(count), settings)
+    optimizer.result = optimizer.layout()
+    return optimizer
+
+
+def test_single_column_mode_only_tries_one_column(settings):
+    for align, mirror in (("right", False), ("right", True)):
+        optimizer = optimize(settings, 20, use_two_columns=False, align=align, mirror_columns=mirror)
+        assert optimizer.evaluated == len(optimizer.font_sizes())
+        assert optimizer.candidate.columns == 1
+        assert optimizer.fits(optimizer.result, optimizer.candidate)
+        assert len(optimizer.result.runs) == 2 + 3 * 20
+
+
+def test_two_column_mode_lays_out_what_it_scored(settings):
+    optimizer = optimize(settings, 58, use_two_columns=True)
+    assert optimizer.candidate.columns == 2
+    assert optimizer.fits(optimizer.result, optimizer.candidate)
+    lefts = [run.xy[0] for run in optimizer.result.runs if run.role == "page_number"]
+    assert min(lefts) < 1240 / 2 < max(lefts)
+    sizes = {run.font[1] for run in optimizer.result.runs if run.role == "chapter_title"}
+    assert sizes == {optimizer.candidate.title_size}
+
+
+def test_falls_back_to_the_regular_layout(settings):
+    optimizer = optimize(settings, 58, use_two_columns=False)
+    assert optimizer.candidate is None
+    settings["page"]["optimize"] = False
+    assert optimizer.result == build_layout("Contents", chapters(58), settings)
+
+
+def test_balance_columns_evens_out_heights():
+    ends = prefix_sums([10, 10, 10, 10, 40])
+    assert balance_columns(ends, 2, 100) == [0, 4, 5]
+    assert balance_columns(ends, 2, 30) is None
+
+
+def test_optimize_with_paginate_is_rejected(tmp_path, content, settings, write_json):
+    settings["page"].update(optimize=True, paginate=True, resolution=[800, 900])
+    with pytest.raises(ValueError, match="paginate"):
+        list(api.render_pages(content, settings))
+    args = argparse.Namespace(input=write_json("toc.json", content), settings=write_json("settings.json", settings),
+                              output=str(tmp_path), name="page.svg")
+    with pytest.raises(ValueError, match="paginate"):
+        main.Create_content_page(args)
+    assert not list(tmp_path.glob("page_*"))
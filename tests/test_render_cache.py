@@ -0,0 +1,79 @@
+import argparse
+import multiprocessing
+import os
+
+from PIL import Image
+
+import main
+from render_cache import RenderCache
+
+COLORS = ["red", "green", "blue", "white", "black", "yellow"]
+
+
+def render(content_path, settings_path, output, cache):
+    args = argparse.Namespace(input=content_path, settings=settings_path, output=output, name="page.png",
+                              cache=cache, cache_size=64)
+    page = main.Create_content_page(args)
+    with Image.open(os.path.join(output, "page.png")) as img:
+        return page.cached, img.tobytes()
+
+
+def test_round_trip_returns_the_rendered_page(tmp_path, content, settings, write_json):
+    content_path, settings_path = write_json("toc.json", content), write_json("settings.json", settings)
+    cache = str(tmp_path / "cache")
+    cached, first = render(content_path, settings_path, str(tmp_path), cache)
+    assert not cached
+    cached, second = render(content_path, settings_path, str(tmp_path), cache)
+    assert cached and second == first
+
+
+def test_rendering_another_page_to_the_same_name_keeps_the_cached_one(tmp_path, content, settings, write_json):
+    settings_path = write_json("settings.json", settings)
+    first_path = write_json("a.json", content)
+    changed = dict(content, title=content["title"] + " 2")
+    second_path = write_json("b.json", changed)
+    cache = str(tmp_path / "cache")
+
+    _, first = render(first_path, settings_path, str(tmp_path), cache)
+    assert render(first_path, settings_path, str(tmp_path), cache)[0]
+    cached, second = render(second_path, settings_path, str(tmp_path), cache)
+    assert not cached and second != first
+    cached, again = render(first_path, settings_path, str(tmp_path), cache)
+    assert cached and again == first
+
+
+def test_fetch_does_not_share_the_file_with_the_cache(tmp_path):
+    cache = RenderCache(str(tmp_path / "cache"))
+    source = tmp_path / "rendered.png"
+    Image.new("RGB", (4, 4), "red").save(source)
+    cache.store("key", str(source))
+    destination = tmp_path / "out.png"
+    assert cache.fetch("key", str(destination))
+    assert not os.path.samefile(destination, cache.path("key", ".png"))
+    assert not cache.fetch("other", str(destination))
+    assert cache.stats() == {"hits": 1, "misses": 1}
+
+
+def store_and_fetch(directory: str, worker: int) -> dict:
+    cache = RenderCache(directory, max_bytes=200)
+    source = os.path.join(directory, "..", f"rendered{worker}.png")
+    destination = os.path.join(directory, "..", f"out{worker}.png")
+    for step in range(60):
+        color = COLORS[(worker + step) % len(COLORS)]
+        Image.new("RGB", (16, 16), color).save(source)
+        cache.store(color, source)
+        other = COLORS[(worker + step * 5) % len(COLORS)]
+        if cache.fetch(other, destination):
+            with Image.open(destination) as img:
+                assert img.getpixel((0, 0)) == Image.new("RGB", (1, 1), other).getpixel((0, 0))
+    return cache.stats()
+
+
+def test_processes_sharing_a_small_cache(tmp_path):
+    directory = str(tmp_path / "cache")
+    os.makedirs(directory)
+    with multiprocessing.Pool(4) as pool:
+        results = pool.starmap(store_and_fetch, [(directory, worker) for worker in range(4)])
+    assert all(result["hits"] + result["misses"] == 60 for result in results)
+    assert not [name for name in os.listdir(tmp_path) if name.endswith(".tmp")]
+    assert not [name for name in os.listdir(directory) if name.endswith(".tmp")]
@@ -0,0 +1,42 @@
+import http.client
+import json
+import threading
+
+import pytest
+
+from server import RenderServer, create_server
+
+
+@pytest.fixture
+def server(settings):
+    server = create_server(RenderServer(settings, max_concurrent=2), port=0, quiet=True)
+    thread = threading.Thread(target=server.serve_forever, daemon=True)
+    thread.start()
+    yield server
+    server.shutdown()
+    server.server_close()
+
+
+def request(server, method: str, path: str, body: dict = None):
+    connection = http.client.HTTPConnection(*server.server_address[:2], timeout=30)
+    connection.request(method, path, json.dumps(body) if body is not None else None)
+    response = connection.getresponse()
+    data = response.read()
+    connection.close()
+    return response, data
+
+
+def test_render_stats_and_errors(server, content):
+    response, data = request(server, "POST", "/render?format=webp", {"content": content})
+    assert response.status == 200 and response.getheader("Content-Type") == "image/webp"
+    assert data[:4] == b"RIFF"
+
+    response, data = request(server, "POST", "/render", {"content": content, "format": "bogus"})
+    assert response.status == 400 and "unknown image format" in json.loads(data)["error"]
+
+    response, data = request(server, "GET", "/stats")
+    report = json.loads(data)
+    assert report["requests"] == 2 and report["errors"] == 1 and report["latency_ms"]["p50"] is not None
+
+    assert request(server, "GET", "/health")[0].status == 200
+    assert request(server, "GET", "/nowhere")[0].status == 404
@@ -0,0 +1,26 @@
+import argparse
+
+import pytest
+
+import main
+from atlas import glyph_atlas
+from metrics import text_metrics
+from stats import stats
+
+
+def test_failed_render_stops_the_stats(tmp_path, content, write_json):
+    args = argparse.Namespace(input=write_json("toc.json", content), settings=str(tmp_path / "missing.json"),
+                              output=str(tmp_path), name="page.png", stats=True)
+    with pytest.raises(FileNotFoundError):
+        main.Create_content_page(args)
+    assert not stats.enabled
+
+
+def test_getmask_calls_count_the_glyph_atlas(tmp_path, content, settings, write_json):
+    text_metrics.clear()
+    glyph_atlas.clear()
+    args = argparse.Namespace(input=write_json("toc.json", content), settings=write_json("settings.json", settings),
+                              output=str(tmp_path), name="page.png", stats=True)
+    report = main.Create_content_page(args).stats
+    assert report["counters"]["getmask_calls"] >= report["caches"]["atlas"]["misses"] > 0
+    assert not stats.enabled
@@ -0,0 +1,53 @@
+import multiprocessing
+from multiprocessing import shared_memory
+
+import pytest
+
+import tiles
+from layout import PageLayout
+from raster import rasterize
+from content import Chapter
+
+
+def test_pages_share_one_pool_and_match_rasterize(monkeypatch, content, settings):
+    settings["page"]["paginate"] = True
+    settings["page"]["resolution"] = [800, 900]
+    chapters = [Chapter.from_dict(chapter) for chapter in content["chapters"]]
+    layouts = list(PageLayout(content["title"], chapters, settings).layout_pages())
+    assert len(layouts) > 1
+
+    started = list()
+    create_pool = multiprocessing.Pool
+
+    def pool(processes):
+        started.append(processes)
+        return create_pool(processes)
+
+    blocks = list()
+    release = tiles.release
+
+    def released(block):
+        blocks.append(block.name)
+        release(block)
+
+    monkeypatch.setattr(tiles, "MIN_TILED_PIXELS", 1)
+    monkeypatch.setattr(tiles.multiprocessing, "Pool", pool)
+    monkeypatch.setattr(tiles, "release", released)
+    with tiles.TiledRasterizer(2) as rasterizer:
+        for layout in layouts:
+            assert rasterizer.rasterize(layout).tobytes() == rasterize(layout).tobytes()
+            assert rasterizer.rasterize_raw(layout) == rasterize(layout).tobytes()
+    assert started == [2]
+    assert rasterizer.pool is None
+    assert len(blocks) == 2 * len(layouts)
+    for name in blocks:
+        with pytest.raises(FileNotFoundError):
+            shared_memory.SharedMemory(name)
+
+
+def test_small_pages_start_no_workers(monkeypatch, content, settings):
+    chapters = [Chapter.from_dict(chapter) for chapter in content["chapters"]]
+    layout = PageLayout(content["title"], chapters, settings).layout_page()
+    monkeypatch.setattr(tiles.multiprocessing, "Pool", None)
+    with tiles.TiledRasterizer(4) as rasterizer:
+        assert rasterizer.rasterize(layout).tobytes() == rasterize(layout).tobytes()
@@ -0,0 +1,36 @@
+import io
+
+from PIL import Image
+
+from variants import save_variants, variant_path
+
+VARIANTS = [
+    {"format": "JPEG", "suffix": "_low", "quality": 5},
+    {"format": "JPEG", "suffix": "_high", "quality": 95},
+    {"format": "WEBP", "suffix": "_low", "quality": 5},
+    {"format": "WEBP", "suffix": "_high", "quality": 95},
+    {"format": "PNG", "suffix": "_small", "width": 100},
+]
+
+
+def encoded(img: Image.Image, variant: dict) -> bytes:
+    if variant.get("width"):
+        height = max(1, round(img.size[1] * variant["width"] / img.size[0]))
+        img = img.resize((variant["width"], height), Image.Resampling.LANCZOS, reducing_gap=3.0)
+    options = {key: value for key, value in variant.items() if key not in ("format", "suffix", "width")}
+    buffer = io.BytesIO()
+    img.save(buffer, format=variant["format"], **options)
+    return buffer.getvalue()
+
+
+def test_threaded_variants_keep_their_own_options(tmp_path):
+    img = Image.effect_noise((600, 400), 64).convert("RGB")
+    expected = [encoded(img, variant) for variant in VARIANTS]
+    destination = str(tmp_path / "page.png")
+    for _ in range(5):
+        results = save_variants(img, destination, VARIANTS, threads=len(VARIANTS))
+        for variant, result, data in zip(VARIANTS, results, expected):
+            assert result["path"] == variant_path(destination, variant)
+            with open(result["path"], "rb") as f:
+                assert f.read() == data, variant
+    assert results[-1]["size"] == [100, 67]
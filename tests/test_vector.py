@@ -0,0 +1,91 @@
+import argparse
+import os
+import xml.etree.ElementTree as ElementTree
+
+import pytest
+from PIL import Image, ImageDraw
+
+import main
+from content import Chapter
+from fonts import get_font
+from layout import Layout, PageLayout, TextRun
+from metrics import MULTILINE_SPACING
+from optimizer import build_layout
+from variants import page_path
+from vector import layout_to_svg
+
+ROOT = os.path.dirname(os.path.dirname(os.path.abspath(__file__)))
+FONT = os.path.join(ROOT, "v2", "fontick.otf")
+SVG = "{http://www.w3.org/2000/svg}"
+
+measure = ImageDraw.Draw(Image.new("RGB", (1, 1)))
+
+
+def svg_texts(document: str) -> tuple:
+    root = ElementTree.fromstring(document)
+    return root, root.findall(SVG + "text")
+
+
+def run_lines(layout: Layout) -> list:
+    return [(run, number, line) for run in layout.runs
+            for number, line in enumerate(run.text.split("\n") if run.multiline else [run.text])]
+
+
+def check_texts(layout: Layout, document: str) -> list:
+    root, texts = svg_texts(document)
+    assert (int(root.get("width")), int(root.get("height"))) == layout.size
+    lines = run_lines(layout)
+    assert len(texts) == len(lines)
+    for (run, number, line), text in zip(lines, texts):
+        font = get_font(*run.font)
+        x, y = float(text.get("x")), float(text.get("y"))
+        assert text.text == line
+        assert int(text.get("font-size")) == run.font[1]
+        assert text.get("fill") == run.fill
+        spacing = number * (font.getbbox("A")[3] + MULTILINE_SPACING)
+        widths = [font.getlength(part) for part in run.text.split("\n")] if run.multiline else [0]
+        left = run.xy[0] + (max(widths) - widths[number] if run.align == "right" else 0)
+        assert measure.textbbox((x, y), line, font=font, anchor="ls") == \
+            measure.textbbox((left, run.xy[1] + spacing), line, font=font)
+        assert y == pytest.approx(run.xy[1] + font.getmetrics()[0] + spacing)
+    return texts
+
+
+@pytest.mark.parametrize("align", ["right", "left"])
+def test_page_text_matches_the_layout(content, settings, align):
+    settings["content"]["style"]["align"] = align
+    chapters = [Chapter.from_dict(chapter) for chapter in content["chapters"]]
+    layout = build_layout(content["title"], chapters, settings)
+    assert {run.align for run in layout.runs} == {"left", "right"}
+    texts = check_texts(layout, layout_to_svg(layout))
+    for (run, _, _), text in zip(run_lines(layout), texts):
+        assert float(text.get("x")) == pytest.approx(run.xy[0])
+
+
+def test_wrapped_lines_are_aligned():
+    font = (FONT, 40, 0)
+    text = "a long first line\nshort\nmiddle line"
+    runs = [TextRun(text, font, (500, 20), "#A30008", "right"), TextRun(text, font, (20, 300), "#000000", "left")]
+    layout = Layout((900, 600), "#FFFFFF", runs)
+    texts = check_texts(layout, layout_to_svg(layout))
+    pil_font = get_font(*font)
+    widths = [pil_font.getlength(line) for line in text.split("\n")]
+    right = [float(element.get("x")) + width for element, width in zip(texts[:3], widths)]
+    assert right == pytest.approx([500 + max(widths)] * 3)
+    assert [float(element.get("x")) for element in texts[3:]] == [20, 20, 20]
+
+
+def test_paginated_svg_pages_match_their_layouts(tmp_path, content, settings, write_json):
+    settings["page"].update(paginate=True, resolution=[1000, 600])
+    chapters = [Chapter.from_dict(chapter) for chapter in content["chapters"]]
+    layouts = list(PageLayout(content["title"], chapters, settings).layout_pages())
+    assert len(layouts) > 1
+
+    args = argparse.Namespace(input=write_json("toc.json", content), settings=write_json("settings.json", settings),
+                              output=str(tmp_path), name="page.svg")
+    main.Create_content_page(args)
+    destination = os.path.join(tmp_path, "page.svg")
+    for number, layout in enumerate(layouts, 1):
+        with open(page_path(destination, number), "r", encoding="utf-8") as f:
+            check_texts(layout, f.read())
+    assert not os.path.exists(page_path(destination, len(layouts) + 1))
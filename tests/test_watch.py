@@ -0,0 +1,67 @@
+import argparse
+import os
+import time
+
+import main
+from batch import collect_jobs
+from watch import Watcher, is_stale, job_outputs
+
+
+def render_job(job: dict) -> None:
+    main.Create_content_page(argparse.Namespace(**job))
+
+
+def make_job(tmp_path, content, settings, write_json) -> dict:
+    return {"input": write_json("toc.json", content), "settings": write_json("settings.json", settings),
+            "output": str(tmp_path), "name": "toc.png"}
+
+
+def test_paginated_job_is_fresh_after_rendering(tmp_path, content, settings, write_json):
+    settings["page"]["paginate"] = True
+    settings["page"]["resolution"] = [1240, 1754]
+    job = make_job(tmp_path, content, settings, write_json)
+    assert job_outputs(job) == [os.path.join(str(tmp_path), "toc_001.png")]
+    assert is_stale(job)
+    render_job(job)
+    assert not is_stale(job)
+
+
+def test_variant_job_is_fresh_after_rendering(tmp_path, content, settings, write_json):
+    settings["output"]["variants"] = [{"suffix": "_full"}, {"suffix": "_small", "format": "JPEG", "width": 200}]
+    job = make_job(tmp_path, content, settings, write_json)
+    assert job_outputs(job) == [os.path.join(str(tmp_path), "toc_full.png"),
+                                os.path.join(str(tmp_path), "toc_small.jpg")]
+    render_job(job)
+    assert not is_stale(job)
+
+    time.sleep(0.01)
+    os.utime(job["settings"])
+    assert is_stale(job)
+
+
+def test_settings_in_the_input_directory_are_not_a_job(tmp_path, content, settings, write_json):
+    write_json("toc.json", content)
+    settings_path = write_json("settings.json", settings)
+    jobs = collect_jobs(str(tmp_path), settings_path, str(tmp_path), "png")
+    assert [os.path.basename(job["input"]) for job in jobs] == ["toc.json"]
+
+
+def test_watcher_finds_the_jobs_a_change_affects(tmp_path, content, settings, write_json):
+    inputs = tmp_path / "inputs"
+    inputs.mkdir()
+    write_json("inputs/a.json", content)
+    write_json("inputs/b.json", content)
+    settings_path = write_json("settings.json", settings)
+    watcher = Watcher(lambda: collect_jobs(str(inputs), settings_path, str(tmp_path), "png"), interval=0, debounce=0)
+    assert watcher.poll() == set()
+
+    with open(inputs / "a.json", "a", encoding="utf-8") as f:
+        f.write(" ")
+    changed = watcher.poll()
+    assert [os.path.basename(job["input"]) for job in watcher.affected(changed)] == ["a.json"]
+
+    os.utime(settings_path, ns=(0, 0))
+    assert len(watcher.affected(watcher.poll())) == 2
+
+    write_json("inputs/c.json", content)
+    assert [os.path.basename(job["input"]) for job in watcher.affected(watcher.poll())] == ["c.json"]
@@ -0,0 +1,45 @@
+import os
+
+from fonts import get_font
+from metrics import text_metrics
+from wrapping import LineBreaker
+
+FONT = os.path.join(os.path.dirname(os.path.dirname(os.path.abspath(__file__))), "v2", "fontick.otf")
+TEXT = "The quick brown fox jumps over the lazy dog while the five boxing wizards jump quickly"
+
+
+def test_short_text_is_fitted_on_one_line():
+    text, font = LineBreaker().wrap("Short title", FONT, 50, 20, 1000)
+    assert text == "Short title" and font.size == 50
+
+
+def test_wrapped_lines_fit_and_keep_every_word():
+    breaker = LineBreaker()
+    for mode in ("greedy", "balanced"):
+        text, font = breaker.wrap(TEXT, FONT, 50, 20, 400, mode)
+        lines = text.split("\n")
+        assert len(lines) > 1
+        assert " ".join(lines) == TEXT
+        assert all(text_metrics.ink_size(line, font)[0] < 400 for line in lines)
+        assert font.size >= 20
+
+
+def test_balanced_lines_are_more_even_than_greedy():
+    breaker = LineBreaker()
+    greedy, font = breaker.wrap(TEXT, FONT, 50, 20, 400, "greedy")
+    balanced, balanced_font = breaker.wrap(TEXT, FONT, 50, 20, 400, "balanced")
+    assert balanced_font.size == font.size
+    assert len(balanced.split("\n")) == len(greedy.split("\n"))
+
+    def spread(text):
+        widths = [text_metrics.ink_size(line, font)[0] for line in text.split("\n")]
+        return max(widths) - min(widths)
+    assert spread(balanced) <= spread(greedy)
+
+
+def test_results_are_cached():
+    breaker = LineBreaker()
+    first = breaker.wrap(TEXT, FONT, 50, 20, 400)
+    second = breaker.wrap(TEXT, FONT, 50, 20, 400)
+    assert first[0] == second[0] and first[1] is second[1] is get_font(FONT, first[1].size)
+    assert breaker.stats()["hits"] == 1 and breaker.stats()["misses"] == 1
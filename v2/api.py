@@ -0,0 +1,196 @@
+from PIL import Image
+from typing import NamedTuple
+import io
+import os
+
+from content import Chapter
+from layout import Layout, PageLayout
+from optimizer import build_layout
+from tiles import TiledRasterizer, rasterize_tiled, rasterize_tiled_raw
+from vector import layout_to_svg
+
+SETTINGS_SECTIONS = ("page", "title", "subtitle", "content", "space")
+
+
+class RawPage(NamedTuple):
+    """Raw pixels of a rendered page"""
+    mode: str
+    size: tuple
+    pixels: memoryview
+
+    def to_image(self) -> Image.Image:
+        """Builds a Pillow image from the pixels
+
+        Returns:
+            Image.Image: The image object
+        """
+        return Image.frombuffer(self.mode, self.size, self.pixels, "raw", self.mode, 0, 1)
+
+
+def read_chapters(content: dict) -> list:
+    """Checks the contents of a volume and keeps only what the page needs
+
+    Args:
+        content (dict): {"title": ..., "chapters": [...]}, chapters as dicts or Chapter
+
+    Returns:
+        list: [title, list of Chapter]
+    """
+    if not isinstance(content, dict) or "title" not in content:
+        raise ValueError("the contents have to be a dict with a title and chapters")
+    chapters = content.get("chapters")
+    if not isinstance(chapters, (list, tuple)):
+        raise ValueError("the chapters of the contents have to be a list")
+    return [content["title"], [chapter if isinstance(chapter, Chapter) else Chapter.from_dict(chapter)
+                               for chapter in chapters]]
+
+
+def check_settings(settings: dict) -> None:
+    """Checks that the settings have every section and that their fonts exist
+
+    Args:
+        settings (dict): page generation settings
+    """
+    if not isinstance(settings, dict):
+        raise ValueError("the settings have to be a dict")
+    missing = [section for section in SETTINGS_SECTIONS if section not in settings]
+    if missing:
+        raise ValueError(f"the settings have no {', '.join(missing)} section")
+    sections = [settings["title"], settings["subtitle"]] + list(settings["content"].values())
+    for section in sections:
+        if isinstance(section, dict) and section.get("font") and not os.path.isfile(section["font"]):
+            raise ValueError(f"the font file does not exist: {section['font']}")
+
+
+def pillow_format(image_format: str) -> str:
+    """Returns the Pillow format of an extension or a format name
+
+    Args:
+        image_format (str): "png", "jpg", "WEBP", ...
+
+    Returns:
+        str: Pillow format
+    """
+    name = image_format.lower().lstrip(".")
+    result = Image.registered_extensions().get("." + name)
+    if result is None and name.upper() in Image.SAVE:
+        result = name.upper()
+    if result is None:
+        raise ValueError(f"unknown image format: {image_format}")
+    return result
+
+
+def layout_page(content: dict, settings: dict) -> Layout:
+    """Lays out a single page
+
+    Args:
+        content (dict): {"title": ..., "chapters": [...]}
+        settings (dict): page generation settings, not paginated
+
+    Returns:
+        Layout: canvas size, background and positioned text runs
+    """
+    check_settings(settings)
+    if settings["page"].get("paginate", False):
+        raise ValueError("the settings are paginated, use render_pages")
+    title, chapters = read_chapters(content)
+    return build_layout(title, chapters, settings)
+
+
+def render_image(content: dict, settings: dict, jobs: int = 1) -> Image.Image:
+    """Renders a single page
+
+    Args:
+        content (dict): {"title": ..., "chapters": [...]}
+        settings (dict): page generation settings, not paginated
+        jobs (int): number of processes drawing bands of large pages
+
+    Returns:
+        Image.Image: The image object
+    """
+    return rasterize_tiled(layout_page(content, settings), jobs)
+
+
+def render_pages(content: dict, settings: dict, jobs: int = 1):
+    """Renders the contents one page at a time, paginated or not
+
+    Args:
+        content (dict): {"title": ..., "chapters": [...]}
+        settings (dict): page generation settings
+        jobs (int): number of processes drawing bands of large pages
+
+    Yields:
+        Image.Image: The image object of the next page
+    """
+    check_settings(settings)
+    title, chapters = read_chapters(content)
+    if not settings["page"].get("paginate", False):
+        yield rasterize_tiled(build_layout(title, chapters, settings), jobs)
+        return
+    with TiledRasterizer(jobs) as rasterizer:
+        for layout in PageLayout(title, chapters, settings).layout_pages():
+            yield rasterizer.rasterize(layout)
+
+
+def render_raw(content: dict, settings: dict, jobs: int = 1) -> RawPage:
+    """Renders a single page into raw RGB pixels
+
+    The pixels are copied out of Pillow once, or out of the shared block
+    the bands are drawn into when drawn by several processes. The view is shaped (height,
+    width, 3), so numpy.asarray() and the like read it without a copy.
+
+    Args:
+        content (dict): {"title": ..., "chapters": [...]}
+        settings (dict): page generation settings, not paginated
+        jobs (int): number of processes drawing bands of large pages
+
+    Returns:
+        RawPage: mode, size and a read-only view of the pixels
+    """
+    layout = layout_page(content, settings)
+    width, height = layout.size
+    pixels = memoryview(rasterize_tiled_raw(layout, jobs)).cast("B", (height, width, 3))
+    return RawPage("RGB", layout.size, pixels)
+
+
+def encode_image(img: Image.Image, buffer: io.BufferedIOBase, image_format: str = "png", **options) -> str:
+    """Encodes an image into a file-like object
+
+    Args:
+        img (Image.Image): The image object
+        buffer (io.BufferedIOBase): where to write, e.g. io.BytesIO
+        image_format (str): extension or Pillow format
+        **options: Pillow save options
+
+    Returns:
+        str: MIME type of the written data
+    """
+    image_format = pillow_format(image_format)
+    img.save(buffer, format=image_format, **options)
+    return Image.MIME.get(image_format, "application/octet-stream")
+
+
+def render_into(buffer: io.BufferedIOBase, content: dict, settings: dict, image_format: str = "png",
+                jobs: int = 1, **options) -> str:
+    """Renders a single page and encodes it into a file-like object, svg uses the vector backend
+
+    Args:
+        buffer (io.BufferedIOBase): where to write, e.g. io.BytesIO
+        content (dict): {"title": ..., "chapters": [...]}
+        settings (dict): page generation settings, not paginated
+        image_format (str): extension or Pillow format
+        jobs (int): number of processes drawing bands of large pages
+        **options: Pillow save options
+
+    Returns:
+        str: MIME type of the written data
+    """
+    if image_format.lower().lstrip(".") == "svg":
+        buffer.write(layout_to_svg(layout_page(content, settings)).encode("utf-8"))
+        return "image/svg+xml"
+    pillow_format(image_format)
+    img = render_image(content, settings, jobs)
+    try:
+        return encode_image(img, buffer, image_format, **options)
+    finally:
+        img.close()
@@ -0,0 +1,196 @@
+from PIL import Image, ImageDraw, ImageFont
+from collections import OrderedDict
+
+from metrics import MULTILINE_SPACING, font_key
+
+
+class GlyphAtlas():
+
+    def __init__(self, max_glyphs: int = 20000):
+        """Alpha masks of single glyphs keyed by (font key, character), composited into runs instead of
+        sending every run back through FreeType
+
+        With the basic layout engine a line is drawn glyph by glyph at
+        integer pen positions: the advance of every glyph plus the kerning
+        of every pair. Blitting the mask of each glyph at its pen position
+        and blending overlapping glyphs like alpha over alpha gives the same
+        pixels as Pillow. Lines that would need subpixel positions, or a
+        pen position that disagrees with font.getlength, are drawn by Pillow.
+
+        Args:
+            max_glyphs (int): how many glyph masks to keep before evicting the least recently used one
+        """
+        self.max_glyphs: int = max_glyphs
+        self.glyphs: OrderedDict = OrderedDict()
+        self.advances: dict = dict()
+        self.kernings: dict = dict()
+        self.hits: int = 0
+        self.misses: int = 0
+        self.fallbacks: int = 0
+
+    def glyph(self, font: ImageFont.FreeTypeFont, key: tuple, char: str) -> tuple:
+        """Returns the mask of a glyph and its offset from the pen position
+
+        The mask is the glyph drawn by Pillow in white on black inside its
+        bounding box, which is the mask getmask2 returns, built with public
+        Image and ImageDraw calls only.
+
+        Args:
+            font (ImageFont.FreeTypeFont): font of the glyph
+            key (tuple): font key of the font
+            char (str): character
+
+        Returns:
+            tuple: (mask or None for blank glyphs, (x, y))
+        """
+        glyph = self.glyphs.get((key, char))
+        if glyph is not None:
+            self.hits += 1
+            self.glyphs.move_to_end((key, char))
+            return glyph
+
+        self.misses += 1
+        left, top, right, bottom = font.getbbox(char)
+        mask = None
+        if right > left and bottom > top:
+            mask = Image.new("L", (right - left, bottom - top))
+            ImageDraw.Draw(mask).text((-left, -top), char, font=font, fill=255)
+        glyph = (mask, (left, top))
+        self.glyphs[(key, char)] = glyph
+        if len(self.glyphs) > self.max_glyphs:
+            self.glyphs.popitem(last=False)
+        return glyph
+
+    def advance(self, font: ImageFont.FreeTypeFont, key: tuple, char: str) -> float:
+        """Returns the advance width of a glyph
+
+        Args:
+            font (ImageFont.FreeTypeFont): font of the glyph
+            key (tuple): font key of the font
+            char (str): character
+
+        Returns:
+            float: advance in pixels
+        """
+        advance = self.advances.get((key, char))
+        if advance is None:
+            advance = self.advances[(key, char)] = font.getlength(char)
+        return advance
+
+    def kerning(self, font: ImageFont.FreeTypeFont, key: tuple, pair: str) -> float:
+        """Returns the kerning between two glyphs
+
+        Args:
+            font (ImageFont.FreeTypeFont): font of the glyphs
+            key (tuple): font key of the font
+            pair (str): two characters
+
+        Returns:
+            float: kerning in pixels
+        """
+        kerning = self.kernings.get((key, pair))
+        if kerning is None:
+            kerning = font.getlength(pair) - self.advance(font, key, pair[0]) - self.advance(font, key, pair[1])
+            self.kernings[(key, pair)] = kerning
+        return kerning
+
+    def draw_line(self, draw: ImageDraw.ImageDraw, xy: tuple, text: str, font: ImageFont.FreeTypeFont, fill) -> None:
+        """Draws a single line of text the way ImageDraw.text draws it
+
+        Args:
+            draw (ImageDraw.ImageDraw): where to draw
+            xy (tuple): left end of the ascender line
+            text (str): line of text
+            font (ImageFont.FreeTypeFont): font of the line
+            fill: colour of the text
+        """
+        key = font_key(font)
+        x, y = xy
+        pen: float = 0
+        previous: str = None
+        placed = list()
+        for char in text:
+            if previous is not None:
+                pen += self.kerning(font, key, previous + char)
+            mask, offset = self.glyph(font, key, char)
+            if mask is not None:
+                placed.append((mask, x + pen + offset[0], y + offset[1]))
+            pen += self.advance(font, key, char)
+            previous = char
+
+        if not placed:
+            return
+        if x != int(x) or y != int(y) or any(left != int(left) for _, left, _ in placed) \
+                or pen != font.getlength(text):
+            self.fallbacks += 1
+            draw.text(xy, text, font=font, fill=fill)
+            return
+
+        left = int(min(item[1] for item in placed))
+        top = int(min(item[2] for item in placed))
+        right = int(max(item[1] + item[0].size[0] for item in placed))
+        bottom = int(max(item[2] + item[0].size[1] for item in placed))
+        line = Image.new("L", (right - left, bottom - top))
+        for mask, glyph_left, glyph_top in placed:
+            line.paste(255, (int(glyph_left) - left, int(glyph_top) - top), mask)
+        draw.bitmap((left, top), line, fill=fill)
+
+    def draw_text(self, draw: ImageDraw.ImageDraw, xy: tuple, text: str, font: ImageFont.FreeTypeFont, fill,
+                  align: str = "left") -> None:
+        """Draws text the way ImageDraw.multiline_text draws it: lines getbbox("A") + 4 px apart,
+        aligned by their advance width
+
+        Fonts using the raqm layout engine can shape glyphs differently in
+        context, so their text is drawn by Pillow.
+
+        Args:
+            draw (ImageDraw.ImageDraw): where to draw
+            xy (tuple): left end of the ascender line of the first line
+            text (str): text, may be wrapped
+            font (ImageFont.FreeTypeFont): font of the text
+            fill: colour of the text
+            align (str): left, center or right
+        """
+        if font.layout_engine != ImageFont.Layout.BASIC or align not in ("left", "center", "right"):
+            self.fallbacks += 1
+            draw.multiline_text(xy, text, font=font, fill=fill, align=align)
+            return
+
+        lines = text.split("\n")
+        if len(lines) == 1:
+            self.draw_line(draw, xy, text, font, fill)
+            return
+
+        line_spacing = font.getbbox("A")[3] + MULTILINE_SPACING
+        widths = [font.getlength(line) for line in lines]
+        x, top = xy
+        for number, line in enumerate(lines):
+            left = x
+            if align == "center":
+                left += (max(widths) - widths[number]) / 2.0
+            elif align == "right":
+                left += max(widths) - widths[number]
+            self.draw_line(draw, (left, top), line, font, fill)
+            top += line_spacing
+
+    def clear(self) -> None:
+        """Drops every glyph and resets the counters
+        """
+        self.glyphs.clear()
+        self.advances.clear()
+        self.kernings.clear()
+        self.hits = 0
+        self.misses = 0
+        self.fallbacks = 0
+
+    def stats(self) -> dict:
+        """Returns the cache counters
+
+        Returns:
+            dict: cached glyphs, hits, misses and lines drawn by Pillow
+        """
+        return {"entries": len(self.glyphs), "max_entries": self.max_glyphs,
+                "hits": self.hits, "misses": self.misses, "fallbacks": self.fallbacks}
+
+
+glyph_atlas = GlyphAtlas()
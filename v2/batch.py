@@ -0,0 +1,210 @@
+import argparse
+import glob
+import json
+import multiprocessing
+import os
+import sys
+import time
+import traceback
+
+from main import Create_content_page
+from stats import merge_reports
+from watch import Watcher
+
+
+def create_console_args() -> argparse.Namespace:
+    """Creates an interface for requesting arguments from the console
+
+    Returns:
+        argparse.Namespace: entered arguments
+    """
+    parser = argparse.ArgumentParser(
+        description="Render many contents pages in one run")
+    parser.add_argument("-i", '--input', required=True,
+                        help="Directory with json files, glob pattern or .jsonl manifest", type=str)
+    parser.add_argument("-o", '--output', required=True,
+                        help="Directory where to save the images", type=str)
+    parser.add_argument("-s", '--settings',
+                        help="Path to json with settings, required unless every manifest line has its own", type=str)
+    parser.add_argument("-f", '--format', default="jpg",
+                        help="Extension of the images named after the input files", type=str)
+    parser.add_argument("-j", '--jobs', default=os.cpu_count(),
+                        help="Number of worker processes", type=int)
+    parser.add_argument("-c", '--cache',
+                        help="Directory of the render cache shared by the workers", type=str)
+    parser.add_argument('--cache-size', default=1024,
+                        help="Size limit of the render cache in megabytes", type=int)
+    parser.add_argument('--stats', nargs="?", const="-",
+                        help="Print timings and counters summed over the batch as json, or write them into the given file", type=str)
+    parser.add_argument('--watch', action="store_true",
+                        help="Keep running and re-render the pages whose json or settings change, in this process")
+    parser.add_argument('--debounce', default=1.0,
+                        help="Seconds without writes before a change is rendered in the watch mode", type=float)
+    return parser.parse_args()
+
+
+def collect_jobs(source: str, settings: str, output: str, extension: str) -> list:
+    """Turns a directory, a glob pattern or a jsonl manifest into a list of jobs
+
+    Manifest lines look like {"input": ..., "settings": ..., "name": ..., "output": ...}.
+    "settings" and "output" fall back to the console arguments, relative paths
+    are resolved against the manifest directory. The settings json is not
+    taken for a contents json when it lies in the input directory.
+
+    Args:
+        source (str): directory, glob pattern or path to a .jsonl manifest
+        settings (str): default settings json
+        output (str): default output directory
+        extension (str): extension of images named after the input files
+
+    Returns:
+        list: jobs as dicts with input, settings, output and name
+    """
+    jobs = list()
+    if source.endswith(".jsonl"):
+        base = os.path.dirname(os.path.abspath(source))
+        with open(source, "r", encoding="utf-8") as f:
+            for line in f:
+                if not line.strip():
+                    continue
+                entry: dict = json.loads(line)
+                for key in ("input", "settings", "output"):
+                    if key in entry and not os.path.isabs(entry[key]):
+                        entry[key] = os.path.join(base, entry[key])
+                jobs.append({"input": entry["input"],
+                             "settings": entry.get("settings", settings),
+                             "output": entry.get("output", output),
+                             "name": entry.get("name", os.path.splitext(os.path.basename(entry["input"]))[0] + "." + extension)})
+        return jobs
+
+    if os.path.isdir(source):
+        paths = sorted(glob.glob(os.path.join(source, "*.json")))
+    else:
+        paths = sorted(glob.glob(source))
+    if settings:
+        paths = [path for path in paths if os.path.abspath(path) != os.path.abspath(settings)]
+    for path in paths:
+        jobs.append({"input": path, "settings": settings, "output": output,
+                     "name": os.path.splitext(os.path.basename(path))[0] + "." + extension})
+    return jobs
+
+
+def render_job(job: dict) -> dict:
+    """Renders one page inside a worker. Fonts and measurements stay cached in the worker between jobs
+
+    Args:
+        job (dict): input, settings, output and name
+
+    Returns:
+        dict: the job with the elapsed time, the stats report and the error, if any
+    """
+    started = time.perf_counter()
+    result = dict(job)
+    try:
+        if job["settings"] is None:
+            raise ValueError("no settings json for this job")
+        page = Create_content_page(argparse.Namespace(**job))
+        result["cached"] = page.cached
+        result["stats_report"] = getattr(page, "stats", None)
+        result["error"] = None
+    except Exception as error:
+        result["stats_report"] = None
+        result["error"] = "".join(traceback.format_exception_only(type(error), error)).strip()
+    result["seconds"] = time.perf_counter() - started
+    return result
+
+
+def run_batch(jobs: list, processes: int) -> list:
+    """Spreads the jobs across a process pool
+
+    Args:
+        jobs (list): jobs from collect_jobs
+        processes (int): number of worker processes
+
+    Returns:
+        list: results from render_job in completion order
+    """
+    results = list()
+    if processes <= 1:
+        finished = map(render_job, jobs)
+    else:
+        pool = multiprocessing.Pool(processes)
+        finished = pool.imap_unordered(render_job, jobs, max(1, len(jobs) // (processes * 8)))
+
+    for result in finished:
+        if result["error"] is not None:
+            print(f"Error: {result['input']}: {result['error']}", file=sys.stderr)
+        results.append(result)
+
+    if processes > 1:
+        pool.close()
+        pool.join()
+    return results
+
+
+def print_summary(results: list, seconds: float) -> None:
+    """Prints throughput and failures of a finished batch
+
+    Args:
+        results (list): results from run_batch
+        seconds (float): wall time of the batch
+    """
+    failed = [result for result in results if result["error"] is not None]
+    done = len(results) - len(failed)
+    print(f"Rendered {done} of {len(results)} pages in {seconds:.2f} s "
+          f"({done / seconds if seconds else 0:.1f} pages/s)")
+    if any(result.get("cache") for result in results):
+        cached = sum(1 for result in results if result.get("cached"))
+        print(f"Render cache: {cached} hits, {done - cached} misses")
+    if failed:
+        print(f"Failed {len(failed)}:")
+        for result in failed:
+            print(f"  {result['input']}: {result['error']}")
+
+
+if __name__ == "__main__":
+    args = create_console_args()
+    if not os.path.isdir(args.output):
+        print("Error: The directory does not exist on this path")
+        quit()
+
+    def collect() -> list:
+        jobs = collect_jobs(args.input, args.settings, args.output, args.format)
+        for job in jobs:
+            job["cache"] = args.cache
+            job["cache_size"] = args.cache_size
+            job["stats"] = bool(args.stats)
+        return jobs
+
+    if args.watch:
+        watcher = Watcher(collect, debounce=args.debounce,
+                          extra_paths=[args.input] if args.input.endswith(".jsonl") else None)
+        print(f"Watching {len(watcher.jobs)} pages, press Ctrl+C to stop")
+
+        def render(jobs: list) -> None:
+            if not jobs:
+                return
+            started = time.perf_counter()
+            results = run_batch(jobs, 1)
+            print(time.strftime("[%H:%M:%S] "), end="")
+            print_summary(results, time.perf_counter() - started)
+
+        try:
+            watcher.run(render)
+        except KeyboardInterrupt:
+            sys.exit(0)
+
+    jobs = collect()
+    started = time.perf_counter()
+    results = run_batch(jobs, args.jobs)
+    print_summary(results, time.perf_counter() - started)
+    if args.stats:
+        report = json.dumps(merge_reports([result["stats_report"] for result in results
+                                          if isinstance(result.get("stats_report"), dict)]), indent=4)
+        if args.stats == "-":
+            print(report)
+        else:
+            with open(args.stats, "w", encoding="utf-8") as f:
+                f.write(report)
+    if any(result["error"] is not None for result in results):
+        sys.exit(1)
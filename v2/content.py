@@ -0,0 +1,242 @@
+from typing import NamedTuple
+import json
+
+
+class Chapter(NamedTuple):
+    """The part of a chapter the page needs. Takes far less memory than the parsed dict"""
+    title: str
+    author: str
+    pages: object
+
+    def get(self, key: str, default=None):
+        """Dict-like access, so a Chapter can be used wherever a chapter dict was
+
+        Args:
+            key (str): title, author or pages
+            default: returned for unknown keys
+
+        Returns:
+            value of the field
+        """
+        if key not in self._fields:
+            return default
+        return getattr(self, key)
+
+    @classmethod
+    def from_dict(cls, chapter: dict) -> "Chapter":
+        """Keeps only title, author and pages of a parsed chapter
+
+        Args:
+            chapter (dict): parsed chapter
+
+        Returns:
+            Chapter: compact chapter
+        """
+        return cls(chapter.get("title"), chapter.get("author"), chapter.get("pages"))
+
+
+class ContentStream():
+
+    def __init__(self, path: str, chunk_size: int = 1 << 16):
+        """Reads the chapters of a contents json one by one without loading the whole file
+
+        Two formats are understood. JSON Lines (.jsonl), where the first
+        line is {"title": ...} and every following line is a chapter, and
+        the usual {"title": ..., "chapters": [...]} json, which is parsed
+        incrementally. The title is known once it has been read, for
+        JSON Lines before the first chapter.
+
+        Args:
+            path (str): conditional or full path to the file
+            chunk_size (int): how many characters to read at once
+        """
+        self.path: str = path
+        self.chunk_size: int = chunk_size
+        self.title: str = None
+
+    def __iter__(self):
+        if self.path.endswith(".jsonl"):
+            return self.iter_lines()
+        return self.iter_json()
+
+    def iter_lines(self):
+        """Yields the chapters of a JSON Lines file
+
+        Yields:
+            Chapter: next chapter
+        """
+        with open(self.path, "r", encoding="utf-8") as f:
+            header_read = False
+            for line in f:
+                if not line.strip():
+                    continue
+                if not header_read:
+                    self.title = json.loads(line)["title"]
+                    header_read = True
+                    continue
+                yield Chapter.from_dict(json.loads(line))
+
+    def iter_json(self):
+        """Yields the chapters of a {"title", "chapters"} json while reading it in chunks
+
+        Yields:
+            Chapter: next chapter
+        """
+        with open(self.path, "r", encoding="utf-8") as f:
+            self.file = f
+            self.buffer: str = ""
+            self.position: int = 0
+            self.eof: bool = False
+            self.decoder = json.JSONDecoder()
+
+            self.expect("{")
+            closed = self.close("}")
+            while not closed:
+                key = self.decode()
+                if not isinstance(key, str):
+                    raise self.error("Expecting property name enclosed in double quotes")
+                self.expect(":")
+                if key == "chapters":
+                    self.expect("[")
+                    last = self.close("]")
+                    while not last:
+                        yield Chapter.from_dict(self.decode())
+                        last = self.separator("]")
+                elif key == "title":
+                    self.title = self.decode()
+                else:
+                    self.decode()
+                closed = self.separator("}")
+            if not self.at_end():
+                raise self.error("Extra data")
+            self.file = None
+
+    def fill(self) -> bool:
+        """Reads the next chunk, dropping the part of the buffer that is already parsed
+
+        Returns:
+            bool: False at the end of the file
+        """
+        if self.eof:
+            return False
+        chunk = self.file.read(self.chunk_size)
+        self.buffer = self.buffer[self.position:] + chunk
+        self.position = 0
+        if not chunk:
+            self.eof = True
+        return bool(chunk)
+
+    def error(self, message: str) -> json.JSONDecodeError:
+        """Builds the error for the current position, as json.load would raise it
+
+        Args:
+            message (str): what is wrong
+
+        Returns:
+            json.JSONDecodeError: error to raise
+        """
+        return json.JSONDecodeError(f"{self.path}: {message}", self.buffer, min(self.position, len(self.buffer)))
+
+    def peek(self) -> str:
+        """Skips whitespace and returns the next character
+
+        Returns:
+            str: next character
+        """
+        while True:
+            while self.position < len(self.buffer) and self.buffer[self.position] in " \t\r\n":
+                self.position += 1
+            if self.position < len(self.buffer):
+                return self.buffer[self.position]
+            if not self.fill():
+                raise self.error("Expecting value")
+
+    def at_end(self) -> bool:
+        """Checks if only whitespace is left
+
+        Returns:
+            bool: True at the end of the file
+        """
+        try:
+            self.peek()
+        except json.JSONDecodeError:
+            return True
+        return False
+
+    def expect(self, char: str) -> None:
+        """Consumes the next character, which has to be char
+
+        Args:
+            char (str): expected character
+        """
+        if self.peek() != char:
+            raise self.error(f"Expecting '{char}'")
+        self.position += 1
+
+    def close(self, char: str) -> bool:
+        """Consumes the closing bracket of an empty object or array
+
+        Args:
+            char (str): "}" or "]"
+
+        Returns:
+            bool: True if the next character was char
+        """
+        if self.peek() != char:
+            return False
+        self.position += 1
+        return True
+
+    def separator(self, char: str) -> bool:
+        """Consumes the "," between two values or the closing bracket after the last one
+
+        Args:
+            char (str): "}" or "]"
+
+        Returns:
+            bool: True if the object or array is closed
+        """
+        if self.close(char):
+            return True
+        self.expect(",")
+        if self.peek() in "]}":
+            raise self.error("Expecting value")
+        return False
+
+    def decode(self):
+        """Decodes the next json value, reading more of the file until the value is complete
+
+        Returns:
+            decoded value
+        """
+        self.peek()
+        while True:
+            try:
+                value, end = self.decoder.raw_decode(self.buffer, self.position)
+            except json.JSONDecodeError:
+                if not self.fill():
+                    raise
+                continue
+            if end == len(self.buffer) and self.fill():
+                continue
+            self.position = end
+            return value
+
+
+def read_content(path: str) -> list:
+    """Reads the title and the chapters of a volume through ContentStream
+
+    The chapters are kept in a list: the layout reads them several times
+    (measuring, splitting into columns or pages, the render cache key) and
+    by index. Only the compact Chapter tuples are kept, not the parsed
+    document.
+
+    Args:
+        path (str): conditional or full path to the file
+
+    Returns:
+        list: [title, list of Chapter]
+    """
+    stream = ContentStream(path)
+    chapters = list(stream)
+    return [stream.title, chapters]
@@ -0,0 +1,108 @@
+from collections import OrderedDict
+
+from fonts import get_font
+from metrics import text_metrics
+
+
+class FontFitter():
+
+    def __init__(self, max_entries: int = 50000):
+        """Finds the largest font size at which a text fits into a width
+
+        Results are cached per (font, size range, text, width), so repeated
+        titles and author names are fitted only once per process.
+
+        Args:
+            max_entries (int): how many results to keep before evicting the least recently used one
+        """
+        self.max_entries: int = max_entries
+        self.results: OrderedDict = OrderedDict()
+        self.hits: int = 0
+        self.misses: int = 0
+        self.probes: int = 0
+
+    def fits(self, text: str, font_path: str, size: int, max_width: int) -> bool:
+        """Checks if the text is narrower than max_width at the given size
+
+        Args:
+            text (str): Text for calculate
+            font_path (str): path to the font file
+            size (int): font size
+            max_width (int): available width
+
+        Returns:
+            bool: True if it fits
+        """
+        self.probes += 1
+        return max_width > text_metrics.text_size(text, get_font(font_path, size))[0]
+
+    def fit(self, text: str, font_path: str, font_size: int, min_font_size: int, max_width: int) -> list:
+        """Binary search for the largest size between font_size and min_font_size that fits
+
+        The sizes checked are the same the linear search used to check: from
+        font_size down to min_font_size + 1.
+
+        Args:
+            text (str): Text for calculate
+            font_path (str): path to the font file
+            font_size (int): preferred font size
+            min_font_size (int): lower bound of the font size
+            max_width (int): available width
+
+        Returns:
+            list: [font, fits]. If nothing fits, the font is the smallest size checked
+        """
+        text = str(text)
+        key = (font_path, font_size, min_font_size, text, max_width)
+        result = self.results.get(key)
+        if result is not None:
+            self.hits += 1
+            self.results.move_to_end(key)
+            size, fits = result
+            return [get_font(font_path, size), fits]
+
+        self.misses += 1
+        if self.fits(text, font_path, font_size, max_width):
+            result = (font_size, True)
+        elif font_size <= min_font_size:
+            result = (font_size, False)
+        else:
+            low: int = min_font_size + 1
+            high: int = font_size - 1
+            best: int = None
+            while low <= high:
+                middle = (low + high) // 2
+                if self.fits(text, font_path, middle, max_width):
+                    best = middle
+                    low = middle + 1
+                else:
+                    high = middle - 1
+            if best is None:
+                result = (min_font_size + 1, False)
+            else:
+                result = (best, True)
+
+        self.results[key] = result
+        if len(self.results) > self.max_entries:
+            self.results.popitem(last=False)
+        return [get_font(font_path, result[0]), result[1]]
+
+    def clear(self) -> None:
+        """Drops every result and resets the counters
+        """
+        self.results.clear()
+        self.hits = 0
+        self.misses = 0
+        self.probes = 0
+
+    def stats(self) -> dict:
+        """Returns the cache counters
+
+        Returns:
+            dict: cached results, hits, misses and measured sizes
+        """
+        return {"entries": len(self.results), "max_entries": self.max_entries,
+                "hits": self.hits, "misses": self.misses, "probes": self.probes}
+
+
+font_fitter = FontFitter()
@@ -0,0 +1,74 @@
+from PIL import ImageFont
+from collections import OrderedDict
+
+
+class FontRegistry():
+
+    def __init__(self, max_fonts: int = 64):
+        """Process-wide cache of loaded truetype fonts
+
+        Args:
+            max_fonts (int): how many fonts to keep before evicting the least recently used one
+        """
+        self.max_fonts: int = max_fonts
+        self.fonts: OrderedDict = OrderedDict()
+        self.hits: int = 0
+        self.misses: int = 0
+
+    def get(self, path: str, size: int, index: int = 0) -> ImageFont.FreeTypeFont:
+        """Returns the font for (path, size, index), loading it only on the first request
+
+        Args:
+            path (str): path to the font file
+            size (int): font size
+            index (int): face index inside the font file
+
+        Returns:
+            ImageFont.FreeTypeFont: loaded font
+        """
+        key = (path, int(size), index)
+        font = self.fonts.get(key)
+        if font is not None:
+            self.hits += 1
+            self.fonts.move_to_end(key)
+            return font
+
+        self.misses += 1
+        font = ImageFont.truetype(path, size=int(size), index=index)
+        self.fonts[key] = font
+        if len(self.fonts) > self.max_fonts:
+            self.fonts.popitem(last=False)
+        return font
+
+    def clear(self) -> None:
+        """Drops every loaded font and resets the counters
+        """
+        self.fonts.clear()
+        self.hits = 0
+        self.misses = 0
+
+    def stats(self) -> dict:
+        """Returns the cache counters
+
+        Returns:
+            dict: loaded fonts, hits and misses
+        """
+        return {"fonts": len(self.fonts), "max_fonts": self.max_fonts,
+                "hits": self.hits, "misses": self.misses}
+
+
+font_registry = FontRegistry()
+
+
+def get_font(path: str, size: int, index: int = 0) -> ImageFont.FreeTypeFont:
+    """Shortcut for font_registry.get
+
+    Args:
+        path (str): path to the font file
+        size (int): font size
+        index (int): face index inside the font file
+
+    Returns:
+        ImageFont.FreeTypeFont: loaded font
+    """
+    return font_registry.get(path, size, index)
@@ -0,0 +1,210 @@
+from PIL import Image
+import json
+import os
+
+from layout import Layout, TextRun
+from raster import rasterize
+from tiles import crop_layout, run_box
+from watch import file_state
+
+LOSSY_FORMATS = (".jpg", ".jpeg", ".webp")
+
+
+def sidecar_path(destination: str) -> str:
+    """Returns where the layout of a rendered page is kept
+
+    Args:
+        destination (str): path of the image
+
+    Returns:
+        str: path of the sidecar json
+    """
+    return destination + ".layout.json"
+
+
+def raster_path(destination: str) -> str:
+    """Returns where the lossless copy of a page saved in a lossy format is kept
+
+    Args:
+        destination (str): path of the image
+
+    Returns:
+        str: path of the lossless copy
+    """
+    return destination + ".raster.png"
+
+
+def lossless_path(destination: str) -> str:
+    """Returns where the page is kept without compression loss: the image itself or its lossless copy
+
+    Args:
+        destination (str): path of the image
+
+    Returns:
+        str: path of the lossless page
+    """
+    if os.path.splitext(destination)[1].lower() in LOSSY_FORMATS:
+        return raster_path(destination)
+    return destination
+
+
+def output_states(destination: str) -> list:
+    """Returns what tells that the page or its lossless copy were written by something else
+
+    Args:
+        destination (str): path of the image
+
+    Returns:
+        list: file_state of the image and of the lossless copy, as lists
+    """
+    states = list()
+    for path in (destination, raster_path(destination)):
+        state = file_state(path)
+        states.append(list(state) if state is not None else None)
+    return states
+
+
+def read_sidecar(destination: str) -> Layout:
+    """Reads the layout the page was rendered with last time
+
+    The layout is trusted only if the page is the one written with it:
+    a render that is not incremental overwrites the page but not the
+    sidecar, and repainting rows onto that page would corrupt it.
+
+    Args:
+        destination (str): path of the image
+
+    Returns:
+        Layout: previous layout or None if there is none or the page changed since
+    """
+    try:
+        with open(sidecar_path(destination), "r", encoding="utf-8") as f:
+            data: dict = json.loads(f.read())
+    except (OSError, ValueError):
+        return None
+    if data.get("outputs") != output_states(destination):
+        return None
+    runs = [TextRun(run[0], tuple(run[1]), tuple(run[2]), *run[3:]) for run in data["runs"]]
+    return Layout(tuple(data["size"]), data["color"], runs)
+
+
+def write_sidecar(layout: Layout, destination: str) -> None:
+    """Saves the layout next to the page for the next incremental render, after the page is saved
+
+    Args:
+        layout (Layout): layout of the page
+        destination (str): path of the image
+    """
+    with open(sidecar_path(destination), "w", encoding="utf-8") as f:
+        f.write(json.dumps({"size": layout.size, "color": layout.color, "runs": layout.runs,
+                            "outputs": output_states(destination)}, ensure_ascii=False))
+
+
+def group_rows(layout: Layout) -> dict:
+    """Groups the runs by chapter, the title and subtitle go to row -1
+
+    Args:
+        layout (Layout): layout of the page
+
+    Returns:
+        dict: chapter index -> list of runs
+    """
+    rows = dict()
+    for run in layout.runs:
+        rows.setdefault(run.chapter, list()).append(run)
+    return rows
+
+
+def dirty_boxes(previous: Layout, layout: Layout) -> list:
+    """Finds the rows that changed between two layouts with the same geometry
+
+    The geometry is the same when the canvas, the background and the
+    vertical position of every run are the same, so only text, fonts and
+    horizontal positions inside rows may differ.
+
+    Args:
+        previous (Layout): layout of the previous render
+        layout (Layout): new layout
+
+    Returns:
+        list: boxes to redraw, or None if the geometry changed
+    """
+    if previous is None or previous.size != layout.size or previous.color != layout.color:
+        return None
+
+    old_rows = group_rows(previous)
+    new_rows = group_rows(layout)
+    if old_rows.keys() != new_rows.keys():
+        return None
+
+    boxes = list()
+    for chapter, runs in new_rows.items():
+        old_runs = old_rows[chapter]
+        if [(run.xy[1], run.role) for run in old_runs] != [(run.xy[1], run.role) for run in runs]:
+            return None
+        if old_runs == runs:
+            continue
+        row_boxes = [run_box(run) for run in old_runs + runs]
+        boxes.append((max(0, int(min(box[0] for box in row_boxes))), max(0, int(min(box[1] for box in row_boxes))),
+                      min(layout.size[0], int(max(box[2] for box in row_boxes)) + 1),
+                      min(layout.size[1], int(max(box[3] for box in row_boxes)) + 1)))
+    return boxes
+
+
+def repaint(img: Image.Image, layout: Layout, box: tuple, run_boxes: list) -> None:
+    """Redraws one box of the page from the layout, exactly as a full render would draw it
+
+    Args:
+        img (Image.Image): previous page
+        layout (Layout): new layout
+        box (tuple): (left, top, right, bottom)
+        run_boxes (list): boxes of the layout runs from run_box
+    """
+    tile = rasterize(crop_layout(layout, box, run_boxes))
+    img.paste(tile, box[:2])
+
+
+def render_incremental(layout: Layout, destination: str) -> dict:
+    """Saves the page redrawing only the rows that changed since the previous render of the same destination
+
+    Falls back to a full render when there is no previous render, the
+    page was overwritten since or the geometry of the page changed. Pages in lossy formats keep a lossless
+    copy next to them, so repainting never compounds compression loss.
+
+    Args:
+        layout (Layout): new layout
+        destination (str): path of the image
+
+    Returns:
+        dict: "mode" (full, partial or unchanged) and the redrawn "boxes"
+    """
+    source: str = lossless_path(destination)
+    lossy: bool = source != destination
+    boxes = dirty_boxes(read_sidecar(destination), layout)
+    img = None
+    if boxes is not None:
+        try:
+            img = Image.open(source)
+            img.load()
+            if img.mode != "RGB" or img.size != tuple(layout.size):
+                img = None
+        except OSError:
+            img = None
+
+    if img is None:
+        mode = "full"
+        boxes = [(0, 0, *layout.size)]
+        img = rasterize(layout)
+    elif not boxes and os.path.exists(destination):
+        return {"mode": "unchanged", "boxes": []}
+    else:
+        mode = "partial"
+        run_boxes = [run_box(run) for run in layout.runs]
+        for box in boxes:
+            repaint(img, layout, box, run_boxes)
+
+    img.save(destination)
+    if lossy:
+        img.save(source, compress_level=1)
+    write_sidecar(layout, destination)
+    return {"mode": mode, "boxes": boxes}
@@ -0,0 +1,552 @@
+from PIL import ImageFont
+from typing import NamedTuple
+import bisect
+import math
+
+from fonts import get_font
+from metrics import font_key, text_metrics
+from fitting import font_fitter
+from stats import stats, timed
+from wrapping import line_breaker
+
+
+class TextRun(NamedTuple):
+    """One positioned piece of text of a laid out page"""
+    text: str
+    font: tuple
+    xy: tuple
+    fill: str
+    align: str = "left"
+    multiline: bool = True
+    role: str = ""
+    chapter: int = -1
+
+
+class Layout(NamedTuple):
+    """Everything needed to draw a page: canvas size, background and text runs"""
+    size: tuple
+    color: str
+    runs: list
+
+
+class ChapterMetrics(NamedTuple):
+    """Measurements of every chapter, taken once and shared by every sizing decision"""
+    title_widths: list
+    title_min_widths: list
+    title_heights: list
+    author_heights: list
+    page_widths: list
+    author_widths: list
+
+
+def measure_chapters(chapters, settings: dict) -> ChapterMetrics:
+    """Measures title, author and page number of every chapter in one pass
+
+    Titles are measured at font_size and min_font_size, authors at font_size
+    and page numbers at the page_number font_size.
+
+    Args:
+        chapters (iterable): chapters with title, author and pages
+        settings (dict): page generation settings
+
+    Returns:
+        ChapterMetrics: per-chapter widths and heights
+    """
+    content: dict = settings["content"]
+    title_font = get_font(content["title"]["font"], content["title"]["font_size"])
+    title_min_font = get_font(content["title"]["font"], content["title"]["min_font_size"])
+    author_font = get_font(content["author"]["font"], content["author"]["font_size"])
+    page_font = get_font(content["page_number"]["font"], content["page_number"]["font_size"])
+    metrics = ChapterMetrics(list(), list(), list(), list(), list(), list())
+    for chapter in chapters:
+        title_width, title_height = text_metrics.text_size(chapter.get("title"), title_font)
+        metrics.title_widths.append(title_width)
+        metrics.title_heights.append(title_height)
+        metrics.title_min_widths.append(text_metrics.text_size(chapter.get("title"), title_min_font)[0])
+        author_width, author_height = text_metrics.text_size(chapter.get("author"), author_font)
+        metrics.author_heights.append(author_height)
+        metrics.author_widths.append(author_width)
+        metrics.page_widths.append(text_metrics.text_size(chapter.get("pages"), page_font)[0])
+    return metrics
+
+
+class PageLayout():
+
+    def __init__(self, title: str, chapters: list, settings: dict):
+        """Lays out a contents page without drawing it
+
+        Args:
+            title (str): title of the volume
+            chapters (list): chapters with title, author and pages
+            settings (dict): page generation settings
+        """
+        self.title: str = title
+        self.chapters: list = chapters
+        self.settings: dict = settings
+        self.measure()
+
+    @timed("measure")
+    def measure(self) -> None:
+        """Measures the chapters and the headers once for the whole layout
+        """
+        self.metrics: ChapterMetrics = measure_chapters(self.chapters, self.settings)
+        self.longest_title: int = max(self.metrics.title_widths)
+        self.longest_min_title: int = max(self.metrics.title_min_widths)
+        self.longest_page_number: int = max(self.metrics.page_widths)
+        self.titles_height: int = sum(self.metrics.title_heights)
+        self.authors_height: int = sum(self.metrics.author_heights)
+        self.title_size: list = self.get_text_size(self.title, get_font(
+            self.settings["title"]["font"], self.settings["title"]["font_size"]))
+        self.subtitle_size: list = self.get_text_size(self.settings["subtitle"]["text"], get_font(
+            self.settings["subtitle"]["font"], self.settings["subtitle"]["font_size"]))
+
+    def page_resolution(self) -> list:
+        """Resolves "auto" sizes and the target aspect ratio of the page
+
+        Returns:
+            list: [Width, Height]
+        """
+        page_width: int = self.settings["page"]["resolution"][0]
+        page_height: int = self.settings["page"]["resolution"][1]
+
+        if page_width == "auto" and page_height == "auto":
+            render_resolution = [
+                self.dynamic_width_calc(), self.dynamic_height_calc()]
+        elif page_width == "auto":
+            render_resolution = [
+                self.dynamic_width_calc(), page_height]
+        elif page_height == "auto":
+            render_resolution = [page_width,
+                                 self.dynamic_height_calc()]
+        else:
+            render_resolution: list = [page_width, page_height]
+
+        if self.settings["page"]["target_aspect_ratio"]:
+            render_resolution = self.calculate_output_resolution(render_resolution)
+        return render_resolution
+
+    @timed("layout_page")
+    def layout_page(self) -> Layout:
+        """High-level method of page layout
+
+        Returns:
+            Layout: canvas size, background and positioned text runs
+        """
+        render_resolution: list = self.page_resolution()
+        self.runs: list = list()
+        if self.settings["content"]["style"]["use_two_columns"] and self.is_enough_space_for_two_columns(render_resolution):
+            self.layout_titles(render_resolution)
+            self.layout_content_two_columns(render_resolution)
+
+        else:
+            self.layout_titles(render_resolution)
+            self.layout_content(render_resolution)
+
+        return Layout(tuple(render_resolution), self.settings["page"]["color"], self.runs)
+
+    def paginated_resolution(self) -> list:
+        """Resolution of every page in the paginated mode, where the page height can not be "auto"
+
+        Returns:
+            list: [Width, Height]
+        """
+        page_width, page_height = self.settings["page"]["resolution"]
+        if page_width == "auto":
+            page_width = self.dynamic_width_calc()
+        if page_height == "auto":
+            if not self.settings["page"]["target_aspect_ratio"]:
+                raise ValueError("Pagination needs a fixed page height or a target_aspect_ratio")
+            w_ratio, h_ratio = self.settings["page"]["target_aspect_ratio"]
+            page_height = math.ceil(page_width * h_ratio / w_ratio)
+        return [page_width, page_height]
+
+    def layout_pages(self):
+        """Splits the chapters across pages of a fixed size and lays them out one page at a time
+
+        The title and subtitle are laid out on the first page and, if
+        "repeat_titles" is set, on every following one. In two columns
+        the chapters of each page are split so both columns get about the
+        same height. The layout optimizer does not support pagination, so
+        "optimize" together with "paginate" raises ValueError.
+
+        Yields:
+            Layout: layout of the next page
+        """
+        if self.settings["page"].get("optimize", False):
+            raise ValueError("The layout optimizer lays out single pages only, it can not be used with paginate")
+        resolution: list = self.paginated_resolution()
+        two_columns: bool = self.settings["content"]["style"]["use_two_columns"] and \
+            self.is_enough_space_for_two_columns(resolution)
+        if two_columns:
+            block_width, page_block = self.two_column_geometry(resolution)
+        else:
+            block_width, page_block = self.content_geometry(resolution)[1:]
+
+        row_ends: list = [0]
+        for index in range(len(self.chapters)):
+            row_ends.append(row_ends[-1] + self.row_height(index, block_width, page_block))
+
+        space: dict = self.settings["space"]
+        bottom: int = resolution[1] - self.settings["page"]["bottom_margin"] + space["title_to_autor"]
+        repeat_titles: bool = self.settings["page"].get("repeat_titles", True)
+        first: int = 0
+        page_number: int = 0
+        while first < len(self.chapters):
+            self.runs = list()
+            if page_number == 0 or repeat_titles:
+                self.layout_titles(resolution)
+            else:
+                self.temp_height = self.settings["page"]["top_margin"]
+
+            if two_columns:
+                first_top = self.temp_height + space["sibtitle_to_content"] * 2
+                second_top = first_top + space["sibtitle_to_content"]
+                last, split = first + 1, first + 1
+                while last < len(self.chapters):
+                    middle = self.balanced_split(row_ends, first, last + 1)
+                    if first_top + row_ends[middle] - row_ends[first] > bottom or \
+                            second_top + row_ends[last + 1] - row_ends[middle] > bottom:
+                        break
+                    last, split = last + 1, middle
+                self.layout_content_two_columns(resolution, first, last, split)
+            else:
+                top = self.temp_height + space["sibtitle_to_content"]
+                last = first + 1
+                while last < len(self.chapters) and top + row_ends[last + 1] - row_ends[first] <= bottom:
+                    last += 1
+                self.layout_content(resolution, first, last)
+
+            yield Layout(tuple(resolution), self.settings["page"]["color"], self.runs)
+            first = last
+            page_number += 1
+
+    def balanced_split(self, row_ends: list, first: int, last: int) -> int:
+        """Finds where to split rows between two columns so the columns have about the same height
+
+        Args:
+            row_ends (list): prefix sums of row heights
+            first (int): index of the first row
+            last (int): index after the last row
+
+        Returns:
+            int: index of the first row of the second column
+        """
+        half = (row_ends[first] + row_ends[last]) / 2
+        split = bisect.bisect_left(row_ends, half, first, last)
+        if split > first and half - row_ends[split - 1] < row_ends[split] - half:
+            split -= 1
+        return max(first + 1, min(split, last - 1)) if last - first > 1 else last
+
+    def add_run(self, text: str, font: ImageFont.FreeTypeFont, xy: tuple, fill: str, align: str = "left",
+                multiline: bool = True, role: str = "", chapter: int = -1) -> None:
+        """Appends a text run to the page being laid out
+
+        Args:
+            text (str): text of the run
+            font (ImageFont.FreeTypeFont): font of the run
+            xy (tuple): top left corner
+            fill (str): text color
+            align (str): alignment of wrapped lines
+            multiline (bool): whether the run may contain line breaks
+            role (str): what the run is: title, subtitle, author, chapter_title or page_number
+            chapter (int): index of the chapter the run belongs to, -1 for headers
+        """
+        self.runs.append(TextRun(text, font_key(font), tuple(xy), fill, align, multiline, role, chapter))
+
+    def dynamic_width_calc(self) -> int:
+        """Automatically adjusts the page width
+
+        Returns:
+            int: width
+        """
+        longest_title: int = self.longest_title
+        longest_page_number: int = self.longest_page_number
+
+        content_block_width: int = self.settings["space"]["title_to_page_number"]
+        if self.settings["content"]["style"]["use_two_columns"]:
+            content_block_width += int((longest_title + longest_page_number)
+                                       * 2 + self.settings["space"]["between_columns"])
+        else:
+            content_block_width += longest_title + longest_page_number
+
+        title_width = self.title_size[0]
+        subtitle_width = self.subtitle_size[0]
+
+        return max([content_block_width, title_width, subtitle_width]) + self.settings["page"]["left_margin"] + self.settings["page"]["right_margin"]
+
+    def dynamic_height_calc(self) -> int:
+        """Automatically adjusts the page height
+
+        Returns:
+            int: height
+        """
+        title_height = self.title_size[1]
+        subtitle_height = self.subtitle_size[1]
+        page_height: int = self.settings["page"]["top_margin"] + self.settings["page"]["bottom_margin"] + \
+            self.settings["space"]["title_to_subtitle"] + self.settings["space"]["sibtitle_to_content"] + title_height + subtitle_height
+        highest_author = self.authors_height
+        highest_title = self.titles_height
+
+        if self.settings["content"]["style"]["use_two_columns"] and self.is_enough_space_for_two_columns([self.dynamic_width_calc(), 0]):
+            page_height += math.ceil((highest_author + highest_title) / 2) + (self.settings["space"]["author_to_title"] + self.settings["space"]["title_to_autor"]) * math.ceil(len(self.chapters)/2) - self.settings["space"]["title_to_autor"]
+        else:
+            page_height += highest_author + highest_title + (self.settings["space"]["author_to_title"] +
+                                                             self.settings["space"]["title_to_autor"]) * len(self.chapters) - self.settings["space"]["title_to_autor"]
+        return page_height
+
+    def calculate_output_resolution(self, input_resolution: tuple):
+        """Get scaled w/h of image for passed w_ration/h_ration
+        E.g.:
+            50x200 with ratio 1x2 -> 100x200
+            150x200 with ratio 1x2 -> 150x300
+        Return:
+            tuple: resolution
+        """
+        img_width: int = input_resolution[0]
+        img_height: int = input_resolution[1]
+        w_ratio: int = self.settings["page"]["target_aspect_ratio"][0]
+        h_ratio: int = self.settings["page"]["target_aspect_ratio"][1]
+        new_width: int = img_width
+        new_height: int = img_height
+
+        horizontal_pixels_per_ratio: int = math.ceil(img_width / w_ratio)
+        vertical_pixels_per_ratio: int = math.ceil(img_height / h_ratio)
+
+        required_height: int = h_ratio * horizontal_pixels_per_ratio
+        required_width: int = w_ratio * vertical_pixels_per_ratio
+
+        if required_height > img_height:
+            new_height = required_height
+
+        if required_width > img_width:
+            new_width = required_width
+        
+        return [new_width, new_height]
+
+    def is_enough_space_for_two_columns(self, render_resolution: int) -> bool:
+        """Checks if there is enough space for two columns 
+
+        Args:
+            render_resolution (int): Img resolution
+
+        Returns:
+            bool: True if enough or False if not enough 
+        """
+        dead_space: int = self.settings["page"]["left_margin"] + \
+            self.settings["page"]["right_margin"] + self.settings["space"]["between_columns"]
+        space_for_column = int((render_resolution[0] - dead_space) / 2)
+
+        longest_title: int = self.longest_min_title
+        longest_page_number: int = self.longest_page_number
+        column = longest_title + longest_page_number + self.settings["space"]["title_to_page_number"]
+
+        if space_for_column >= column:
+            return True
+        else:
+            return False
+
+    def get_text_size(self, text: str, font: ImageFont.ImageFont) -> tuple:
+        """Calculates how much width and height the text will take with the specified background
+
+        Args:
+            text (str): Text for calculate
+            font (ImageFont.ImageFont): Font for calculate
+
+        Returns:
+            tuple: [Width, Height]
+        """
+        return text_metrics.text_size(text, font)
+
+    @timed("layout_titles")
+    def layout_titles(self, resolution: tuple):
+        height = self.settings["page"]["top_margin"]
+        max_width = resolution[0] - \
+            self.settings["page"]["left_margin"] - self.settings["page"]["right_margin"]
+        title_text, title_font = self.resize(
+            self.title, self.settings["title"]["font"], self.settings["title"]["font_size"], self.settings["title"]["min_font_size"], max_width)
+        title_width, title_height = self.get_text_size(title_text, title_font)
+        self.temp_height = height + title_height + self.settings["space"]["title_to_subtitle"]
+        self.add_run(title_text, title_font, (int(resolution[0]/2 - title_width/2), height),
+                     self.settings["title"]["font_color"], role="title")
+
+        subtitle_text, subtitle_font = self.resize(
+            self.settings["subtitle"]["text"], self.settings["subtitle"]["font"], self.settings["subtitle"]["font_size"], self.settings["subtitle"]["min_font_size"], max_width)
+        subtitle_width, subtitle_height = self.get_text_size(
+            subtitle_text, subtitle_font)
+        self.add_run(subtitle_text, subtitle_font, (int(resolution[0]/2 - subtitle_width/2), self.temp_height),
+                     self.settings["subtitle"]["font_color"], role="subtitle")
+        self.temp_height += subtitle_height
+        self.temp_height += self.settings["space"]["sibtitle_to_content"]
+
+    def resize(self, text: str, font_path: str, font_size: int, min_font_size: int, max_width: int) -> list:
+        return line_breaker.wrap(text, font_path, font_size, min_font_size, max_width,
+                                 self.settings["page"].get("wrap", "greedy"))
+
+    def content_geometry(self, resolution: tuple) -> list:
+        """Calculates where the single column of chapters goes
+
+        Args:
+            resolution (tuple): page resolution
+
+        Returns:
+            list: [left border, block width, page number block width]
+        """
+        page_block = self.longest_page_number + self.settings["space"]["title_to_page_number"]
+        left_border = self.settings["page"]["left_margin"]
+        
+        if self.settings["content"]["style"]["align"].lower().strip() == "right":
+            block_width = resolution[0] - self.settings["page"]["left_margin"] - self.settings["page"]["right_margin"]
+            if self.settings["content"]["style"]["mirror_columns"]:
+              left_border = self.longest_title + page_block
+                
+        else:
+            block_width = self.longest_title + page_block
+            if block_width > resolution[0] - self.settings["page"]["left_margin"] - self.settings["page"]["right_margin"]:
+                block_width = resolution[0] - \
+                    self.settings["page"]["left_margin"] - self.settings["page"]["right_margin"]
+        return [left_border, block_width, page_block]
+
+    def two_column_geometry(self, resolution: tuple) -> list:
+        """Calculates the width of each of the two columns of chapters
+
+        Args:
+            resolution (tuple): page resolution
+
+        Returns:
+            list: [block width, page number block width]
+        """
+        block_width = self.longest_title
+        page_block = self.longest_page_number + self.settings["space"]["title_to_page_number"]
+        block_width += page_block
+        if block_width > int((resolution[0] - self.settings["page"]["left_margin"] - self.settings["page"]["right_margin"] - self.settings["space"]["between_columns"])/2):
+            block_width = int((resolution[0] - self.settings["page"]["left_margin"] -
+                               self.settings["page"]["right_margin"] - self.settings["space"]["between_columns"])/2)
+        return [block_width, page_block]
+
+    @timed("layout_content")
+    def layout_content(self, resolution: tuple, first: int = 0, last: int = None):
+        left_border, block_width, page_block = self.content_geometry(resolution)
+        if last is None:
+            last = len(self.chapters)
+
+        self.layout_rows(self.chapters[first:last], first, left_border, block_width, page_block, self.settings["content"]["style"]["mirror_columns"])
+
+    @timed("layout_content_two_columns")
+    def layout_content_two_columns(self, resolution: tuple, first: int = 0, last: int = None, split: int = None):
+        self.temp_height += self.settings["space"]["sibtitle_to_content"]
+
+        block_width, page_block = self.two_column_geometry(resolution)
+        left_border = self.settings["page"]["left_margin"]
+        if last is None:
+            last = len(self.chapters)
+        if split is None:
+            split = first + int((last - first)/2)
+
+        first_column_content: tuple = self.chapters[first:split]
+        second_column_content: tuple = self.chapters[split:last]
+        self.layout_rows(first_column_content, first, left_border, block_width, page_block)
+        left_border = self.settings["page"]["left_margin"] + block_width + self.settings["space"]["between_columns"]
+        self.layout_rows(second_column_content, split, left_border,
+                         block_width, page_block, True)
+
+    def layout_columns(self, resolution: tuple, splits: list, block_width: int) -> None:
+        """Lays out the chapters in as many columns as splits has gaps, every column starting at the same height
+
+        Columns alternate like the two-column layout: page numbers on the
+        right in the first column, on the left in the second and so on.
+
+        Args:
+            resolution (tuple): page resolution
+            splits (list): index of the first chapter of every column and len(self.chapters) at the end
+            block_width (int): width of every column
+        """
+        page_block = self.longest_page_number + self.settings["space"]["title_to_page_number"]
+        top: int = self.temp_height
+        for column, (first, last) in enumerate(zip(splits, splits[1:])):
+            self.temp_height = top
+            left_border = self.settings["page"]["left_margin"] + column * (block_width + self.settings["space"]["between_columns"])
+            self.layout_rows(self.chapters[first:last], first, left_border, block_width, page_block, column % 2 == 1)
+
+    def fit_row(self, index: int, block_width: int, page_block: int) -> list:
+        """Fits the author and the title of a chapter into its row
+
+        Args:
+            index (int): index of the chapter
+            block_width (int): width of the column
+            page_block (int): width reserved for page numbers
+
+        Returns:
+            list: [author, author font, title, title font]
+        """
+        chapter: dict = self.chapters[index]
+        if stats.enabled:
+            probes: int = font_fitter.probes + line_breaker.probes
+        author, author_font = self.resize(
+            chapter.get("author"), self.settings["content"]["author"]["font"], self.settings["content"]["author"]["font_size"], self.settings["content"]["author"]["min_font_size"], block_width-page_block)
+        title, title_font = self.resize(
+            chapter.get("title"), self.settings["content"]["title"]["font"], self.settings["content"]["title"]["font_size"], self.settings["content"]["title"]["min_font_size"], block_width - self.metrics.page_widths[index]-page_block)
+        if stats.enabled:
+            stats.count_probes(index, font_fitter.probes + line_breaker.probes - probes)
+        return [author, author_font, title, title_font]
+
+    def row_height(self, index: int, block_width: int, page_block: int) -> int:
+        """Returns how much height a chapter takes, the space after it included
+
+        Args:
+            index (int): index of the chapter
+            block_width (int): width of the column
+            page_block (int): width reserved for page numbers
+
+        Returns:
+            int: height
+        """
+        author, author_font, title, title_font = self.fit_row(index, block_width, page_block)
+        return self.get_text_size(author, author_font)[1] + self.settings["space"]["author_to_title"] + \
+            self.get_text_size(title, title_font)[1] + self.settings["space"]["title_to_autor"]
+
+    @timed("layout_rows")
+    def layout_rows(self, chapters: list, first_index: int, left_border: int, block_width: int, page_block: int, mirrored: bool = False):
+        self.temp_height += self.settings["space"]["sibtitle_to_content"]
+        autor_fill = self.settings["content"]["author"]["font_color"]
+        title_fill = self.settings["content"]["title"]["font_color"]
+        page_num_fill = self.settings["content"]["page_number"]["font_color"]
+        temp_height: int = self.temp_height
+        if mirrored:
+            align: str = "left"
+        else:
+            align: str = "right"
+
+        for index, chapter in enumerate(chapters, first_index):
+            pages: str = str(chapter.get("pages"))
+            author, author_font, title, title_font = self.fit_row(index, block_width, page_block)
+
+            autor_width, autor_height = self.get_text_size(author, author_font)
+            if mirrored:
+                author_start_coordinate: int = left_border+page_block
+            else:
+                author_start_coordinate: int = left_border + \
+                    block_width - autor_width - page_block
+            self.add_run(author, author_font, (author_start_coordinate, temp_height),
+                         autor_fill, align, role="author", chapter=index)
+            temp_height += autor_height + self.settings["space"]["author_to_title"]
+
+            page_font = get_font(
+                self.settings["content"]["page_number"]["font"], self.settings["content"]["page_number"]["font_size"])
+            page_width = self.metrics.page_widths[index]
+            if mirrored:
+                page_start_coordinate: int = left_border
+            else:
+                page_start_coordinate: int = left_border+block_width-page_width
+            self.add_run(pages, page_font, (page_start_coordinate, temp_height),
+                         page_num_fill, multiline=False, role="page_number", chapter=index)
+
+            title_width, title_height = self.get_text_size(title, title_font)
+            if mirrored:
+                title_start_coordinate: int = left_border+page_block
+            else:
+                title_start_coordinate: int = left_border+block_width-title_width-page_block
+            self.add_run(title, title_font, (title_start_coordinate, temp_height),
+                         title_fill, align, role="chapter_title", chapter=index)
+            temp_height += title_height + \
+                self.settings["space"]["title_to_autor"]
+
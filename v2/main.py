@@ -1,21 +1,178 @@
-from PIL import Image, ImageDraw, ImageFont
-import math
+from PIL import Image
 import json
 import os
 import argparse
 import sys
+import time
+
+from content import read_content
+from incremental import lossless_path, render_incremental
+from layout import Layout, PageLayout
+from optimizer import build_layout
+from render_cache import open_cache
+from stats import stats
+from tiles import TiledRasterizer, rasterize_tiled
+from variants import page_path, save_variants, variant_path
+from vector import is_vector, write_svg
 
 class Create_content_page():
 
-    def __init__(self):
+    def __init__(self, args: argparse.Namespace = None):
         """Generate and save contents page from json
+
+        Args:
+            args (argparse.Namespace, optional): input, settings, output and name. Requested from the console if not passed
+        """
+        started: float = time.perf_counter()
+        from_console: bool = args is None
+        if from_console:
+            args = self.create_console_args()
+
+        stats_output = getattr(args, "stats", None)
+        if stats_output:
+            stats.start()
+            stats.add_phase("arguments", time.perf_counter() - started)
+
+        try:
+            with stats.phase("json_load"):
+                self.read_content_json(args.input)
+                self.read_settings_json(args.settings)
+            self.render(args, f"{args.output}/{args.name}")
+        except BaseException:
+            if stats_output:
+                stats.cancel()
+            raise
+
+        if stats_output:
+            self.stats: dict = stats.stop()
+            self.write_stats(stats_output)
+
+        if from_console:
+            if self.cache is not None:
+                print(f"Render cache: {self.cache.hits} hits, {self.cache.misses} misses")
+            if self.incremental is not None:
+                print(f"Incremental render: {self.incremental['mode']}, {len(self.incremental['boxes'])} areas redrawn")
+            for variant in self.variants:
+                print(f"{variant['path']}: {variant['size'][0]}x{variant['size'][1]}, "
+                      f"{variant['bytes']} bytes, {variant['seconds'] * 1000:.0f} ms")
+            if self.pages:
+                print(f"Done! {len(self.pages)} pages")
+            else:
+                print("Done!")
+
+    def render(self, args: argparse.Namespace, destination: str) -> None:
+        """Renders and saves the page, or every page in the paginated mode, unless it is in the render cache
+
+        Args:
+            args (argparse.Namespace): console arguments
+            destination (str): path of the image
+        """
+        self.cached: bool = False
+        self.cache = None
+        self.pages: list = None
+        self.incremental: dict = None
+        self.variants: list = list()
+        self.jobs: int = getattr(args, "jobs", 1) or 1
+        if self.settings["page"].get("paginate", False):
+            self.pages = self.save_pages(destination)
+            return
+
+        if getattr(args, "incremental", False) and not is_vector(destination):
+            self.layout: Layout = build_layout(self.title, self.chapters, self.settings)
+            with stats.phase("incremental"):
+                self.incremental: dict = render_incremental(self.layout, destination)
+            self.save_incremental_variants(destination)
+            return
+
+        variants: list = self.output_variants(destination)
+        if variants:
+            targets: list = [variant_path(destination, variant) for variant in variants]
+        else:
+            targets: list = [destination]
+
+        cache_directory: str = getattr(args, "cache", None)
+        if cache_directory:
+            self.cache = open_cache(cache_directory, getattr(args, "cache_size", 1024) * 1024 ** 2)
+            keys = [self.cache.key({"title": self.title, "chapters": self.chapters},
+                                   self.settings, os.path.splitext(target)[1], {"variant": number})
+                    for number, target in enumerate(targets)]
+            self.cached = all([self.cache.fetch(key, target) for key, target in zip(keys, targets)])
+
+        if not self.cached:
+            if is_vector(destination):
+                self.layout: Layout = build_layout(self.title, self.chapters, self.settings)
+                with stats.phase("save"):
+                    write_svg(self.layout, destination)
+            else:
+                img = self.draw_page()
+                with stats.phase("save"):
+                    self.save_image(img, destination)
+            if cache_directory:
+                for key, target in zip(keys, targets):
+                    self.cache.store(key, target)
+
+    def output_variants(self, destination: str) -> list:
+        """Returns the output variants from the settings, vector output has none
+
+        Args:
+            destination (str): path of the image
+
+        Returns:
+            list: variant settings, empty to save only the destination
+        """
+        if is_vector(destination):
+            return list()
+        return self.settings.get("output", {}).get("variants", list())
+
+    def save_image(self, img: Image.Image, destination: str) -> None:
+        """Saves the image, or every output variant of it if the settings have any
+
+        Args:
+            img (Image.Image): The image object
+            destination (str): path of the image
+        """
+        variants: list = self.output_variants(destination)
+        if not variants:
+            img.save(destination)
+            return
+        results = save_variants(img, destination, variants, self.settings["output"].get("threads"))
+        self.variants.extend(results)
+
+    def save_incremental_variants(self, destination: str) -> None:
+        """Saves the output variants of an incrementally rendered page
+
+        The full page stays at the destination as the base of the next
+        repaint. The variants are encoded from its lossless copy, and only
+        when the page changed or one of them is missing.
+
+        Args:
+            destination (str): path of the image
+        """
+        variants: list = self.output_variants(destination)
+        if not variants:
+            return
+        if self.incremental["mode"] == "unchanged" and \
+                all(os.path.exists(variant_path(destination, variant)) for variant in variants):
+            return
+        with Image.open(lossless_path(destination)) as img:
+            img.load()
+            with stats.phase("save"):
+                self.variants.extend(save_variants(img, destination, variants, self.settings["output"].get("threads")))
+
+    def write_stats(self, output) -> None:
+        """Prints the stats report as json or writes it into a file
+
+        Args:
+            output: "-" for the console, a path, or True to only keep the report in self.stats
         """
-        args = self.create_console_args()
-        self.read_content_json(args.input)
-        self.read_settings_json(args.settings)
-        img = self.draw_page()
-        img.save(f"{args.output}/{args.name}")
-        print("Done!")
+        if output is True:
+            return
+        report = json.dumps(self.stats, indent=4)
+        if output == "-":
+            print(report)
+        else:
+            with open(output, "w", encoding="utf-8") as f:
+                f.write(report)
 
     def create_console_args(self) -> argparse.Namespace:
         """Creates an interface for requesting arguments from the console
@@ -32,6 +189,17 @@ class Create_content_page():
                             help="Name of img", type=str)
         parser.add_argument("-s", '--settings', required=True,
                             help="Path to json with settings", type=str)
+        parser.add_argument("-c", '--cache',
+                            help="Directory of the render cache, pages with unchanged input are copied from it", type=str)
+        parser.add_argument('--cache-size', default=1024,
+                            help="Size limit of the render cache in megabytes", type=int)
+        parser.add_argument('--incremental', action="store_true",
+                            help="Keep the layout next to the image and redraw only changed rows next time, bypasses the render cache. "
+                                 "Output variants are saved from the full page kept at the destination")
+        parser.add_argument('--stats', nargs="?", const="-",
+                            help="Print timings and counters as json, or write them into the given file", type=str)
+        parser.add_argument("-j", '--jobs', default=1,
+                            help="Number of processes drawing bands of large pages", type=int)
         args = parser.parse_args()
         self.check_console_args(args)
         return args
@@ -60,16 +228,12 @@ class Create_content_page():
             quit()
 
     def read_content_json(self, path: str) -> None:
-        """Reads json file containing the contents of the volume
+        """Reads json or json lines file containing the contents of the volume, chapter by chapter
 
         Args:
             path (str): conditional or full path to the file
         """
-        with open(path, "r", encoding="utf-8") as f:
-            content: dict = json.loads(f.read())
-
-        self.title: str = content["title"]
-        self.chapters: tuple = content["chapters"]
+        self.title, self.chapters = read_content(path)
 
     def read_settings_json(self, path: str) -> None:
         """Reads json file containing the page generation settings
@@ -88,311 +252,48 @@ class Create_content_page():
         Returns:
             Image.Image: The image object
         """
-        page_width: int = self.settings["page"]["resolution"][0]
-        page_height: int = self.settings["page"]["resolution"][1]
-        
-        if page_width == "auto" and page_height == "auto":
-            render_resolution = [
-                self.dynamic_width_calc(), self.dynamic_height_calc()]
-        elif page_width == "auto":
-            render_resolution = [
-                self.dynamic_width_calc(), page_height]
-        elif page_height == "auto":
-            render_resolution = [page_width,
-                                 self.dynamic_height_calc()]
-        else:
-            render_resolution: dict = [page_width, page_height]
-
-        if self.settings["page"]["target_aspect_ratio"]:
-            render_resolution = self.calculate_output_resolution(render_resolution)
-
-        self.img = Image.new("RGB", render_resolution, color=self.settings["page"]["color"])
-        self.draw_text = ImageDraw.Draw(self.img)
-
-        if self.settings["content"]["style"]["use_two_columns"] and self.is_enough_space_for_two_columns(render_resolution):
-            self.draw_titles(render_resolution)
-            self.draw_content_two_columns(render_resolution)
-
-        else:
-            self.draw_titles(render_resolution)
-            self.draw_content(render_resolution)
-
+        self.layout: Layout = build_layout(self.title, self.chapters, self.settings)
+        with stats.phase("rasterize"):
+            self.img = rasterize_tiled(self.layout, getattr(self, "jobs", 1))
         return self.img
 
-    def dynamic_width_calc(self) -> int:
-        """Automatically adjusts the page width
-
-        Returns:
-            int: width
-        """
-        longest_title: int = self.get_longest_line(ImageFont.truetype(
-            self.settings["content"]["title"]["font"], self.settings["content"]["title"]["font_size"]), "title")
-        longest_page_number: int = self.get_longest_line(ImageFont.truetype(
-            self.settings["content"]["page_number"]["font"], self.settings["content"]["page_number"]["font_size"]), "pages")
-
-        content_block_width: int = self.settings["space"]["title_to_page_number"]
-        if self.settings["content"]["style"]["use_two_columns"]:
-            content_block_width += int((longest_title + longest_page_number)
-                                       * 2 + self.settings["space"]["between_columns"])
-        else:
-            content_block_width += longest_title + longest_page_number
+    def draw_pages(self):
+        """Renders the contents split across pages of a fixed size, one page at a time, on one pool of workers
 
-        title_width = self.get_text_size(self.title, ImageFont.truetype(
-            self.settings["title"]["font"], self.settings["title"]["font_size"]))[0]
-        subtitle_width = self.get_text_size(self.settings["subtitle"]["text"], ImageFont.truetype(
-            self.settings["subtitle"]["font"], self.settings["subtitle"]["font_size"]))[0]
-
-        return max([content_block_width, title_width, subtitle_width]) + self.settings["page"]["left_margin"] + self.settings["page"]["right_margin"]
-
-    def dynamic_height_calc(self) -> int:
-        """Automatically adjusts the page height
-
-        Returns:
-            int: height
+        Yields:
+            Image.Image: The image object of the next page
         """
-        title_height = self.get_text_size(self.title, ImageFont.truetype(
-            self.settings["title"]["font"], self.settings["title"]["font_size"]))[1]
-        subtitle_height = self.get_text_size(self.settings["subtitle"]["text"], ImageFont.truetype(
-            self.settings["subtitle"]["font"], self.settings["subtitle"]["font_size"]))[1]
-        page_height: int = self.settings["page"]["top_margin"] + self.settings["page"]["bottom_margin"] + \
-            self.settings["space"]["title_to_subtitle"] + self.settings["space"]["sibtitle_to_content"] + title_height + subtitle_height
-        highest_author = self.get_hight_of_lines(ImageFont.truetype(
-            self.settings["content"]["author"]["font"], self.settings["content"]["author"]["font_size"]), "author")
-        highest_title = self.get_hight_of_lines(ImageFont.truetype(
-            self.settings["content"]["title"]["font"], self.settings["content"]["title"]["font_size"]), "title")
-
-        if self.settings["content"]["style"]["use_two_columns"] and self.is_enough_space_for_two_columns([self.dynamic_width_calc(), 0]):
-            page_height += math.ceil((highest_author + highest_title) / 2) + (self.settings["space"]["author_to_title"] + self.settings["space"]["title_to_autor"]) * math.ceil(len(self.chapters)/2) - self.settings["space"]["title_to_autor"]
-        else:
-            page_height += highest_author + highest_title + (self.settings["space"]["author_to_title"] +
-                                                             self.settings["space"]["title_to_autor"]) * len(self.chapters) - self.settings["space"]["title_to_autor"]
-        return page_height
-
-    def calculate_output_resolution(self, input_resolution: tuple):
-        """Get scaled w/h of image for passed w_ration/h_ration
-        E.g.:
-            50x200 with ratio 1x2 -> 100x200
-            150x200 with ratio 1x2 -> 150x300
-        Return:
-            tuple: resolution
-        """
-        img_width: int = input_resolution[0]
-        img_height: int = input_resolution[1]
-        w_ratio: int = self.settings["page"]["target_aspect_ratio"][0]
-        h_ratio: int = self.settings["page"]["target_aspect_ratio"][1]
-        new_width: int = img_width
-        new_height: int = img_height
-
-        horizontal_pixels_per_ratio: int = math.ceil(img_width / w_ratio)
-        vertical_pixels_per_ratio: int = math.ceil(img_height / h_ratio)
-
-        required_height: int = h_ratio * horizontal_pixels_per_ratio
-        required_width: int = w_ratio * vertical_pixels_per_ratio
-
-        if required_height > img_height:
-            new_height = required_height
+        with TiledRasterizer(getattr(self, "jobs", 1)) as rasterizer:
+            for layout in PageLayout(self.title, self.chapters, self.settings).layout_pages():
+                with stats.phase("rasterize"):
+                    img = rasterizer.rasterize(layout)
+                yield img
 
-        if required_width > img_width:
-            new_width = required_width
-        
-        return [new_width, new_height]
-
-    def is_enough_space_for_two_columns(self, render_resolution: int) -> bool:
-        """Checks if there is enough space for two columns 
+    def save_pages(self, destination: str) -> list:
+        """Saves every page as name_001.ext, name_002.ext, ... releasing each image before drawing the next
 
         Args:
-            render_resolution (int): Img resolution
+            destination (str): path of the image, the page number is added before the extension
 
         Returns:
-            bool: True if enough or False if not enough 
+            list: paths of the saved pages
         """
-        dead_space: int = self.settings["page"]["left_margin"] + \
-            self.settings["page"]["right_margin"] + self.settings["space"]["between_columns"]
-        space_for_column = int((render_resolution[0] - dead_space) / 2)
-
-        longest_title: int = self.get_longest_line(ImageFont.truetype(
-            self.settings["content"]["title"]["font"], self.settings["content"]["title"]["min_font_size"]), "title")
-        longest_page_number: int = self.get_longest_line(ImageFont.truetype(
-            self.settings["content"]["page_number"]["font"], self.settings["content"]["page_number"]["font_size"]), "pages")
-        column = longest_title + longest_page_number + self.settings["space"]["title_to_page_number"]
-
-        if space_for_column >= column:
-            return True
-        else:
-            return False
-
-    def get_text_size(self, text: str, font: ImageFont.ImageFont) -> tuple:
-        """Calculates how much width and height the text will take with the specified background
-
-        Args:
-            text (str): Text for calculate
-            font (ImageFont.ImageFont): Font for calculate
-
-        Returns:
-            tuple: [Width, Height]
-        """
-        text = str(text)
-        width = font.getmask(text).getbbox()[2]
-        height = font.getmask(text).getbbox()[3]
-        if "\n" in text:
-            height += height + int(height/3)
-            width = width - font.getmask(text[text.find("\n"):]).getbbox()[2]
-        return [width, height]
-
-
-    def get_longest_line(self, font: ImageFont.ImageFont, key: str) -> int:
-        """Returns the width of the longest line with the specified font
-
-        Args:
-            font (ImageFont.ImageFont): Font for calculate
-            key (str): key of tuple
-
-        Returns:
-            int: Width
-        """
-        lines = list()
-        for chapter in self.chapters:
-            lines.append(self.get_text_size(chapter.get(key), font)[0])
-        return (max(lines))
-
-    def get_hight_of_lines(self, font: ImageFont.ImageFont, key: str) -> int:
-        lines = 0
-        for chapter in self.chapters:
-            lines += self.get_text_size(chapter.get(key), font)[1]
-        return (lines)
-
-    def draw_titles(self, resolution: tuple):
-        height = self.settings["page"]["top_margin"]
-        max_width = resolution[0] - \
-            self.settings["page"]["left_margin"] - self.settings["page"]["right_margin"]
-        title_text, title_font = self.resize(
-            self.title, self.settings["title"]["font"], self.settings["title"]["font_size"], self.settings["title"]["min_font_size"], max_width)
-        title_width, title_height = self.get_text_size(title_text, title_font)
-        self.temp_height = height + title_height + self.settings["space"]["title_to_subtitle"]
-        self.draw_text.multiline_text(
-            (int(self.img.size[0]/2 - title_width/2), height), title_text, font=title_font, fill=self.settings["title"]["font_color"])
-
-        subtitle_text, subtitle_font = self.resize(
-            self.settings["subtitle"]["text"], self.settings["subtitle"]["font"], self.settings["subtitle"]["font_size"], self.settings["subtitle"]["min_font_size"], max_width)
-        subtitle_width, subtitle_height = self.get_text_size(
-            subtitle_text, subtitle_font)
-        self.draw_text.multiline_text(
-            (int(self.img.size[0]/2 - subtitle_width/2), self.temp_height), subtitle_text, font=subtitle_font, fill=self.settings["subtitle"]["font_color"])
-        self.temp_height += subtitle_height
-        self.temp_height += self.settings["space"]["sibtitle_to_content"]
-
-    def resize(self, text: str, font_path: str, font_size: int, min_font_size: int, max_width: int) -> list:
-        font = ImageFont.truetype(font_path, size=font_size)
-        if max_width > self.get_text_size(text, font)[0]:
-            return [text, font]
-        else:
-            for iter in range(font_size - min_font_size):
-                font = ImageFont.truetype(font_path, size=font_size - iter)
-                if max_width > self.get_text_size(text, font)[0]:
-                    return [text, font]
-
-            words_list = text.split(" ")
-            temp_line = ""
-            for word in words_list:
-                temp_line = temp_line + word + " "
-                if self.get_text_size(temp_line, font)[0] >= max_width:
-                    temp_line = temp_line.strip()
-                    temp_line = temp_line[:temp_line.rfind(" ")]
-                    text = temp_line + "\n" + text[len(temp_line) + 1:]
-                    return [text, font]
-
-    def draw_content(self, resolution: tuple):
-        page_block = self.get_longest_line(ImageFont.truetype(
-            self.settings["content"]["page_number"]["font"], size=self.settings["content"]["page_number"]["font_size"]), "pages") + self.settings["space"]["title_to_page_number"]
-        left_border = self.settings["page"]["left_margin"]
-        
-        if self.settings["content"]["style"]["align"].lower().strip() == "right":
-            block_width = resolution[0] - self.settings["page"]["left_margin"] - self.settings["page"]["right_margin"]
-            if self.settings["content"]["style"]["mirror_columns"]:
-              left_border = self.get_longest_line(ImageFont.truetype(
-                    self.settings["content"]["title"]["font"], size=self.settings["content"]["title"]["font_size"]), "title") + page_block
-                
-        else:
-            block_width = self.get_longest_line(ImageFont.truetype(
-            self.settings["content"]["title"]["font"], size=self.settings["content"]["title"]["font_size"]), "title") + page_block
-            if block_width > resolution[0] - self.settings["page"]["left_margin"] - self.settings["page"]["right_margin"]:
-                block_width = resolution[0] - \
-                    self.settings["page"]["left_margin"] - self.settings["page"]["right_margin"]
-
-        
-
-        self.draw(self.chapters, left_border, block_width, page_block, self.settings["content"]["style"]["mirror_columns"])
-
-    def draw_content_two_columns(self, resolution: tuple):
-        self.temp_height += self.settings["space"]["sibtitle_to_content"]
-
-        block_width = self.get_longest_line(ImageFont.truetype(
-            self.settings["content"]["title"]["font"], size=self.settings["content"]["title"]["font_size"]), "title")
-        page_block = self.get_longest_line(ImageFont.truetype(
-            self.settings["content"]["page_number"]["font"], size=self.settings["content"]["page_number"]["font_size"]), "pages") + self.settings["space"]["title_to_page_number"]
-        block_width += page_block
-        if block_width > int((resolution[0] - self.settings["page"]["left_margin"] - self.settings["page"]["right_margin"] - self.settings["space"]["between_columns"])/2):
-            block_width = int((resolution[0] - self.settings["page"]["left_margin"] -
-                               self.settings["page"]["right_margin"] - self.settings["space"]["between_columns"])/2)
-        left_border = self.settings["page"]["left_margin"]
-
-        first_column_content: tuple = self.chapters[:int(len(self.chapters)/2)]
-        second_column_content: tuple = self.chapters[int(
-            len(self.chapters)/2):]
-        self.draw(first_column_content, left_border, block_width, page_block)
-        left_border = self.settings["page"]["left_margin"] + block_width + self.settings["space"]["between_columns"]
-        self.draw(second_column_content, left_border,
-                  block_width, page_block, True)
-
-    def draw(self, chapters: list, left_border: int, block_width: int, page_block: int, mirrored: bool = False):
-        self.temp_height += self.settings["space"]["sibtitle_to_content"]
-        autor_fill = self.settings["content"]["author"]["font_color"]
-        title_fill = self.settings["content"]["title"]["font_color"]
-        page_num_fill = self.settings["content"]["page_number"]["font_color"]
-        temp_height: int = self.temp_height
-        if mirrored:
-            align: str = "left"
-        else:
-            align: str = "right"
-
-        for chapter in chapters:
-            author: str = chapter.get("author")
-            title: str = chapter.get("title")
-            pages: str = str(chapter.get("pages"))
-
-            author, author_font = self.resize(
-                author, self.settings["content"]["author"]["font"], self.settings["content"]["author"]["font_size"], self.settings["content"]["author"]["min_font_size"], block_width-page_block)
-            autor_width, autor_height = self.get_text_size(author, author_font)
-            if mirrored:
-                author_start_coordinate: int = left_border+page_block
-            else:
-                author_start_coordinate: int = left_border + \
-                    block_width - autor_width - page_block
-            self.draw_text.multiline_text(
-                (author_start_coordinate, temp_height), author, font=author_font, fill=autor_fill, align=align)
-            temp_height += autor_height + self.settings["space"]["author_to_title"]
-
-            page_font = ImageFont.truetype(
-                self.settings["content"]["page_number"]["font"], self.settings["content"]["page_number"]["font_size"])
-            page_width = self.get_text_size(pages, page_font)[0]
-            if mirrored:
-                page_start_coordinate: int = left_border
-            else:
-                page_start_coordinate: int = left_border+block_width-page_width
-            self.draw_text.text((page_start_coordinate,
-                                 temp_height), pages, font=page_font, fill=page_num_fill)
-
-            title, title_font = self.resize(
-                title, self.settings["content"]["title"]["font"], self.settings["content"]["title"]["font_size"], self.settings["content"]["title"]["min_font_size"], block_width - page_width-page_block)
-            title_width, title_height = self.get_text_size(title, title_font)
-            if mirrored:
-                title_start_coordinate: int = left_border+page_block
-            else:
-                title_start_coordinate: int = left_border+block_width-title_width-page_block
-            self.draw_text.multiline_text(
-                (title_start_coordinate, temp_height), title, font=title_font, fill=title_fill, align=align)
-            temp_height += title_height + \
-                self.settings["space"]["title_to_autor"]
+        paths = list()
+        if is_vector(destination):
+            for number, layout in enumerate(PageLayout(self.title, self.chapters, self.settings).layout_pages(), 1):
+                path = page_path(destination, number)
+                with stats.phase("save"):
+                    write_svg(layout, path)
+                paths.append(path)
+            return paths
+
+        for number, img in enumerate(self.draw_pages(), 1):
+            path = page_path(destination, number)
+            with stats.phase("save"):
+                self.save_image(img, path)
+            img.close()
+            paths.append(path)
+        return paths
 
 
 if __name__ == "__main__":
@@ -0,0 +1,117 @@
+from PIL import ImageFont
+from collections import OrderedDict
+
+MULTILINE_SPACING = 4
+
+
+def font_key(font: ImageFont.FreeTypeFont) -> tuple:
+    """Returns the registry key of a loaded font
+
+    Args:
+        font (ImageFont.FreeTypeFont): loaded font
+
+    Returns:
+        tuple: (path, size, index)
+    """
+    return (font.path, font.size, font.index)
+
+
+class TextMetrics():
+
+    def __init__(self, max_entries: int = 200000):
+        """Memoized text measurements keyed by (font key, text)
+
+        The ink box of a string is taken from a single rasterization of it.
+        FreeType bbox and advance queries are cheaper but differ from the ink
+        box by up to a few pixels, which would shift the layout.
+
+        Args:
+            max_entries (int): how many measured strings to keep before evicting the least recently used one
+        """
+        self.max_entries: int = max_entries
+        self.boxes: OrderedDict = OrderedDict()
+        self.spacings: dict = dict()
+        self.hits: int = 0
+        self.misses: int = 0
+
+    def ink_size(self, text: str, font: ImageFont.FreeTypeFont) -> list:
+        """Returns the right and bottom edge of the ink drawn for a single line of text
+
+        Args:
+            text (str): Text for calculate
+            font (ImageFont.FreeTypeFont): Font for calculate
+
+        Returns:
+            list: [Width, Height]
+        """
+        text = str(text)
+        key = (font_key(font), text)
+        box = self.boxes.get(key)
+        if box is not None:
+            self.hits += 1
+            self.boxes.move_to_end(key)
+            return list(box)
+
+        self.misses += 1
+        bbox = font.getmask(text).getbbox()
+        box = (bbox[2], bbox[3]) if bbox else (0, 0)
+        self.boxes[key] = box
+        if len(self.boxes) > self.max_entries:
+            self.boxes.popitem(last=False)
+        return list(box)
+
+    def text_size(self, text: str, font: ImageFont.FreeTypeFont) -> list:
+        """Calculates how much width and height the text will take, wrapped text included
+
+        Wrapped lines are getbbox("A") + 4 px apart as Pillow draws them, so
+        the height is the offset of the last line plus its own height.
+
+        Args:
+            text (str): Text for calculate
+            font (ImageFont.FreeTypeFont): Font for calculate
+
+        Returns:
+            list: [Width, Height]
+        """
+        text = str(text)
+        if "\n" not in text:
+            return self.ink_size(text, font)
+        lines = text.split("\n")
+        width = max(self.ink_size(line, font)[0] for line in lines)
+        height = (len(lines) - 1) * self.line_spacing(font) + self.ink_size(lines[-1], font)[1]
+        return [width, height]
+
+    def line_spacing(self, font: ImageFont.FreeTypeFont) -> int:
+        """Returns the distance between the tops of wrapped lines
+
+        Args:
+            font (ImageFont.FreeTypeFont): Font for calculate
+
+        Returns:
+            int: distance in pixels
+        """
+        key = font_key(font)
+        spacing = self.spacings.get(key)
+        if spacing is None:
+            spacing = self.spacings[key] = font.getbbox("A")[3] + MULTILINE_SPACING
+        return spacing
+
+    def clear(self) -> None:
+        """Drops every measurement and resets the counters
+        """
+        self.boxes.clear()
+        self.spacings.clear()
+        self.hits = 0
+        self.misses = 0
+
+    def stats(self) -> dict:
+        """Returns the cache counters
+
+        Returns:
+            dict: cached strings, hits and misses
+        """
+        return {"entries": len(self.boxes), "max_entries": self.max_entries,
+                "hits": self.hits, "misses": self.misses}
+
+
+text_metrics = TextMetrics()
@@ -0,0 +1,354 @@
+from bisect import bisect_right
+from typing import NamedTuple
+import copy
+
+from fonts import get_font
+from layout import Layout, PageLayout
+from metrics import text_metrics
+from stats import timed
+
+ROW_TEXTS = {"author": "author", "chapter_title": "title", "page_number": "pages"}
+
+
+class Candidate(NamedTuple):
+    """A way to lay out the chapters: number of columns and uniform font sizes"""
+    columns: int
+    title_size: int
+    author_size: int
+    page_size: int
+
+
+class RowEnds():
+
+    def __init__(self, author_ends: list, title_ends: list, author_scale: float, title_scale: float, gap: int):
+        """Prefix sums of row heights at scaled font sizes, computed on access so bisect needs no list per candidate
+
+        Args:
+            author_ends (list): prefix sums of author heights at the reference size
+            title_ends (list): prefix sums of title heights at the reference size
+            author_scale (float): candidate author size / reference size
+            title_scale (float): candidate title size / reference size
+            gap (int): space inside and after every row
+        """
+        self.author_ends: list = author_ends
+        self.title_ends: list = title_ends
+        self.author_scale: float = author_scale
+        self.title_scale: float = title_scale
+        self.gap: int = gap
+
+    def __len__(self) -> int:
+        return len(self.title_ends)
+
+    def __getitem__(self, index: int) -> float:
+        return self.author_ends[index] * self.author_scale + self.title_ends[index] * self.title_scale + self.gap * index
+
+
+def prefix_sums(values: list) -> list:
+    """Returns [0, v0, v0 + v1, ...]
+
+    Args:
+        values (list): numbers
+
+    Returns:
+        list: prefix sums
+    """
+    ends = [0]
+    for value in values:
+        ends.append(ends[-1] + value)
+    return ends
+
+
+def fill_columns(row_ends, columns: int, limit: float) -> list:
+    """Fills columns from the top, each up to limit
+
+    Args:
+        row_ends: prefix sums of row heights
+        columns (int): number of columns
+        limit (float): height available to the rows of a column
+
+    Returns:
+        list: index of the first row of every used column and the number of rows, or None if they do not fit
+    """
+    splits = [0]
+    rows = len(row_ends) - 1
+    for _ in range(columns):
+        first = splits[-1]
+        last = min(rows, bisect_right(row_ends, row_ends[first] + limit) - 1)
+        if last == first:
+            return None
+        splits.append(last)
+        if last == rows:
+            return splits
+    return None
+
+
+def balance_columns(row_ends, columns: int, limit: float) -> list:
+    """Splits rows into at most columns columns so the tallest column is as short as possible
+
+    Args:
+        row_ends: prefix sums of row heights
+        columns (int): number of columns
+        limit (float): height available to the rows of a column
+
+    Returns:
+        list: splits from fill_columns, or None if the rows do not fit
+    """
+    splits = fill_columns(row_ends, columns, limit)
+    if splits is None:
+        return None
+    low, high = 0, int(limit)
+    while low < high:
+        middle = (low + high) // 2
+        balanced = fill_columns(row_ends, columns, middle)
+        if balanced is None:
+            low = middle + 1
+        else:
+            high = middle
+            splits = balanced
+    return splits
+
+
+class LayoutOptimizer():
+
+    def __init__(self, title: str, chapters: list, settings: dict):
+        """Searches column counts and uniform content font sizes for a fixed page and lays out the best one
+
+        Every chapter is measured once at the font sizes of the settings.
+        Candidates are scored by scaling those measurements, without
+        measuring or drawing anything, so the whole search costs a few
+        milliseconds. The column counts follow the configured column mode.
+        Only the winner is measured and laid out at its own sizes, and the
+        next candidate is tried if it does not fit after all.
+
+        Args:
+            title (str): title of the volume
+            chapters (list): chapters with title, author and pages
+            settings (dict): page generation settings, the page resolution has to be fixed
+        """
+        self.title: str = title
+        self.chapters: list = chapters
+        self.settings: dict = settings
+        self.resolution: list = list(settings["page"]["resolution"])
+        if "auto" in self.resolution:
+            raise ValueError("The layout optimizer needs a fixed page resolution")
+
+        self.reference = PageLayout(title, chapters, settings)
+        self.reference.runs = list()
+        self.reference.layout_titles(self.resolution)
+        space: dict = settings["space"]
+        self.top: int = self.reference.temp_height + space["sibtitle_to_content"]
+        self.bottom: int = self.resolution[1] - settings["page"]["bottom_margin"] + space["title_to_autor"]
+        self.gap: int = space["author_to_title"] + space["title_to_autor"]
+        self.evaluated: int = 0
+        self.verified: int = 0
+
+    def column_width(self, columns: int) -> int:
+        """Returns the width of every column when there are several
+
+        Args:
+            columns (int): number of columns
+
+        Returns:
+            int: width
+        """
+        free = self.resolution[0] - self.settings["page"]["left_margin"] - self.settings["page"]["right_margin"] - \
+            self.settings["space"]["between_columns"] * (columns - 1)
+        return int(free / columns)
+
+    def column_counts(self) -> list:
+        """Returns the numbers of columns the configured column mode allows
+
+        One column unless use_two_columns is set, then up to max_columns.
+
+        Returns:
+            list: numbers of columns
+        """
+        if not self.settings["content"]["style"]["use_two_columns"]:
+            return [1]
+        return list(range(1, self.settings["page"].get("max_columns", 2) + 1))
+
+    def geometry(self, columns: int, longest_title: float, page_block: float) -> list:
+        """Returns where the rows of a candidate go, as the layout it is rendered with places them
+
+        A single column is laid out by PageLayout.layout_content, so it
+        follows the configured align and mirror_columns, several columns by
+        PageLayout.layout_columns.
+
+        Args:
+            columns (int): number of columns
+            longest_title (float): width of the longest chapter title at the candidate size
+            page_block (float): width reserved for page numbers at the candidate size
+
+        Returns:
+            list: [left border of the first column, block width, mirrored]
+        """
+        page: dict = self.settings["page"]
+        style: dict = self.settings["content"]["style"]
+        if columns > 1:
+            return [page["left_margin"], self.column_width(columns), False]
+        free = self.resolution[0] - page["left_margin"] - page["right_margin"]
+        if style["align"].lower().strip() == "right":
+            left_border = longest_title + page_block if style["mirror_columns"] else page["left_margin"]
+            return [left_border, free, style["mirror_columns"]]
+        return [page["left_margin"], min(longest_title + page_block, free), style["mirror_columns"]]
+
+    def font_sizes(self) -> list:
+        """Lists the uniform sizes to try, largest first. Authors and page numbers scale with the titles
+
+        Returns:
+            list: (title, author, page number) sizes
+        """
+        content: dict = self.settings["content"]
+        title, author, page = content["title"], content["author"], content["page_number"]
+        sizes = list()
+        for title_size in range(title["font_size"], title["min_font_size"] - 1, -1):
+            scale = title_size / title["font_size"]
+            author_size = max(author["min_font_size"], min(author["font_size"], round(author["font_size"] * scale)))
+            page_size = max(1, round(page["font_size"] * scale))
+            sizes.append((title_size, author_size, page_size))
+        return sizes
+
+    @timed("optimize")
+    def search(self) -> list:
+        """Scores every candidate from the reference measurements
+
+        Returns:
+            list: candidates that should fit, best first: largest titles, then fewest columns
+        """
+        content: dict = self.settings["content"]
+        metrics = self.reference.metrics
+        combined = max(title + page for title, page in zip(metrics.title_widths, metrics.page_widths))
+        longest_title = max(metrics.title_widths)
+        longest_page = max(metrics.page_widths)
+        longest_author = max(metrics.author_widths)
+        author_ends = prefix_sums(metrics.author_heights)
+        title_ends = prefix_sums(metrics.title_heights)
+        available = self.bottom - self.top
+
+        fitting = list()
+        for title_size, author_size, page_size in self.font_sizes():
+            title_scale = title_size / content["title"]["font_size"]
+            author_scale = author_size / content["author"]["font_size"]
+            page_scale = page_size / content["page_number"]["font_size"]
+            page_block = longest_page * page_scale + self.settings["space"]["title_to_page_number"]
+            widest = max(longest_title * title_scale, longest_author * author_scale)
+            row_ends = RowEnds(author_ends, title_ends, author_scale, title_scale, self.gap)
+            for columns in self.column_counts():
+                self.evaluated += 1
+                left_border, block_width, mirrored = self.geometry(columns, longest_title * title_scale, page_block)
+                if combined * max(title_scale, page_scale) + page_block >= block_width or \
+                        longest_author * author_scale + page_block >= block_width:
+                    continue
+                if (left_border + page_block + widest if mirrored else left_border + block_width) > self.resolution[0]:
+                    continue
+                if fill_columns(row_ends, columns, available) is not None:
+                    fitting.append(Candidate(columns, title_size, author_size, page_size))
+        return fitting
+
+    def sized_settings(self, candidate: Candidate) -> dict:
+        """Returns the settings with the content font sizes of a candidate
+
+        Args:
+            candidate (Candidate): candidate layout
+
+        Returns:
+            dict: settings
+        """
+        settings = copy.deepcopy(self.settings)
+        for key, size in (("title", candidate.title_size), ("author", candidate.author_size),
+                          ("page_number", candidate.page_size)):
+            settings["content"][key]["font_size"] = size
+            settings["content"][key]["min_font_size"] = size
+        return settings
+
+    def fits(self, layout: Layout, candidate: Candidate) -> bool:
+        """Checks that every row of a laid out candidate keeps its sizes, is not wrapped and stays on the page
+
+        Args:
+            layout (Layout): laid out candidate
+            candidate (Candidate): candidate layout
+
+        Returns:
+            bool: True if it fits
+        """
+        sizes = {"author": candidate.author_size, "chapter_title": candidate.title_size,
+                 "page_number": candidate.page_size}
+        bottom = self.resolution[1] - self.settings["page"]["bottom_margin"]
+        for run in layout.runs:
+            if run.chapter < 0:
+                continue
+            if run.font[1] != sizes[run.role] or run.text != str(self.chapters[run.chapter].get(ROW_TEXTS[run.role])):
+                return False
+            width, height = text_metrics.text_size(run.text, get_font(*run.font))
+            if run.xy[0] < 0 or run.xy[0] + width > self.resolution[0] or run.xy[1] + height > bottom:
+                return False
+        return True
+
+    def verify(self, candidate: Candidate) -> Layout:
+        """Lays out a candidate at its own sizes, with the chapters split between the columns by height
+
+        Args:
+            candidate (Candidate): candidate layout
+
+        Returns:
+            Layout: canvas size, background and positioned text runs, or None if the candidate does not fit
+        """
+        self.verified += 1
+        page_layout = PageLayout(self.title, self.chapters, self.sized_settings(candidate))
+        if candidate.columns > 1:
+            metrics = page_layout.metrics
+            block_width = self.column_width(candidate.columns)
+            page_block = page_layout.longest_page_number + self.settings["space"]["title_to_page_number"]
+            if any(block_width - page - page_block <= title
+                   for title, page in zip(metrics.title_widths, metrics.page_widths)):
+                return None
+            if any(block_width - page_block <= author for author in metrics.author_widths):
+                return None
+            row_ends = prefix_sums([author + title + self.gap
+                                    for author, title in zip(metrics.author_heights, metrics.title_heights)])
+            splits = balance_columns(row_ends, candidate.columns, self.bottom - self.top)
+            if splits is None:
+                return None
+
+        page_layout.runs = list()
+        page_layout.layout_titles(self.resolution)
+        if candidate.columns > 1:
+            page_layout.layout_columns(self.resolution, splits, block_width)
+        else:
+            page_layout.layout_content(self.resolution)
+        layout = Layout(tuple(self.resolution), self.settings["page"]["color"], page_layout.runs)
+        return layout if self.fits(layout, candidate) else None
+
+    def layout(self) -> Layout:
+        """Lays out the best candidate that fits, or the page as usual if none does
+
+        Returns:
+            Layout: canvas size, background and positioned text runs
+        """
+        for candidate in self.search():
+            layout = self.verify(candidate)
+            if layout is not None:
+                self.candidate: Candidate = candidate
+                return layout
+
+        self.candidate = None
+        return self.reference.layout_page()
+
+
+def build_layout(title: str, chapters: list, settings: dict) -> Layout:
+    """Lays out a single page, searching for the best columns and font sizes if "optimize" is set
+
+    Paginated renders do not come here: PageLayout.layout_pages lays out
+    every page as usual and rejects "optimize".
+
+    Args:
+        title (str): title of the volume
+        chapters (list): chapters with title, author and pages
+        settings (dict): page generation settings
+
+    Returns:
+        Layout: canvas size, background and positioned text runs
+    """
+    if settings["page"].get("optimize", False):
+        return LayoutOptimizer(title, chapters, settings).layout()
+    return PageLayout(title, chapters, settings).layout_page()
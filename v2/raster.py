@@ -0,0 +1,29 @@
+from PIL import Image, ImageDraw
+
+from atlas import GlyphAtlas, glyph_atlas
+from fonts import get_font
+from layout import Layout
+
+
+def rasterize(layout: Layout, atlas: GlyphAtlas = glyph_atlas) -> Image.Image:
+    """Draws a laid out page with Pillow
+
+    Args:
+        layout (Layout): layout from PageLayout.layout_page
+        atlas (GlyphAtlas, optional): glyph cache the runs are composited from, None draws every run with
+            ImageDraw. Defaults to the shared glyph_atlas.
+
+    Returns:
+        Image.Image: The image object
+    """
+    img = Image.new("RGB", layout.size, color=layout.color)
+    draw_text = ImageDraw.Draw(img)
+    for run in layout.runs:
+        font = get_font(*run.font)
+        if atlas is not None:
+            atlas.draw_text(draw_text, run.xy, run.text, font, run.fill, run.align if run.multiline else "left")
+        elif run.multiline:
+            draw_text.multiline_text(run.xy, run.text, font=font, fill=run.fill, align=run.align)
+        else:
+            draw_text.text(run.xy, run.text, font=font, fill=run.fill)
+    return img
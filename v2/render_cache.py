@@ -0,0 +1,206 @@
+import PIL
+import hashlib
+import json
+import os
+import shutil
+
+
+class RenderCache():
+
+    def __init__(self, directory: str, max_bytes: int = 1024 ** 3):
+        """On-disk cache of rendered pages addressed by the hash of everything that affects the output
+
+        Args:
+            directory (str): where cached images are kept, created if missing
+            max_bytes (int): total size of cached images before the least recently used ones are evicted
+        """
+        self.directory: str = directory
+        self.max_bytes: int = max_bytes
+        self.hits: int = 0
+        self.misses: int = 0
+        self.font_digests: dict = dict()
+        self.size: int = None
+        os.makedirs(directory, exist_ok=True)
+
+    def font_digest(self, path: str) -> str:
+        """Returns the sha256 of a font file, rehashing it only when the file changes
+
+        Args:
+            path (str): path to the font file
+
+        Returns:
+            str: hex digest
+        """
+        stat = os.stat(path)
+        key = (path, stat.st_mtime_ns, stat.st_size)
+        digest = self.font_digests.get(key)
+        if digest is None:
+            with open(path, "rb") as f:
+                digest = hashlib.sha256(f.read()).hexdigest()
+            self.font_digests[key] = digest
+        return digest
+
+    def key(self, content: dict, settings: dict, extension: str, options: dict = None) -> str:
+        """Builds the cache key of a page
+
+        Args:
+            content (dict): title and chapters of the volume
+            settings (dict): page generation settings
+            extension (str): extension of the output image
+            options (dict, optional): options passed to Image.save
+
+        Returns:
+            str: hex digest
+        """
+        fonts = sorted(set(find_fonts(settings)))
+        normalized = {
+            "content": content,
+            "settings": settings,
+            "fonts": [self.font_digest(path) for path in fonts],
+            "format": extension.lower().lstrip("."),
+            "options": options or {},
+            "pillow": PIL.__version__,
+        }
+        data = json.dumps(normalized, sort_keys=True, ensure_ascii=False, separators=(",", ":"))
+        return hashlib.sha256(data.encode("utf-8")).hexdigest()
+
+    def path(self, key: str, extension: str) -> str:
+        """Returns where the image for the key is kept
+
+        Args:
+            key (str): cache key
+            extension (str): extension of the output image
+
+        Returns:
+            str: path inside the cache directory
+        """
+        return os.path.join(self.directory, key + "." + extension.lower().lstrip("."))
+
+    def fetch(self, key: str, destination: str) -> bool:
+        """Copies a cached image to the destination
+
+        The copy is written next to the destination and moved over it, so
+        the output never shares a file with the cache entry: a later render
+        writing the same output name cannot change the cached image. An
+        entry evicted by another process before it is copied counts as a
+        miss.
+
+        Args:
+            key (str): cache key
+            destination (str): path of the output image
+
+        Returns:
+            bool: True on a hit, False if the page has to be rendered
+        """
+        cached = self.path(key, os.path.splitext(destination)[1])
+        temp = destination + f".{os.getpid()}.tmp"
+        try:
+            os.utime(cached)
+            shutil.copyfile(cached, temp)
+        except FileNotFoundError:
+            if os.path.exists(temp):
+                os.remove(temp)
+            self.misses += 1
+            return False
+
+        os.replace(temp, destination)
+        self.hits += 1
+        return True
+
+    def store(self, key: str, source: str) -> None:
+        """Puts a freshly rendered image into the cache and evicts old ones if the cache is full
+
+        The size of the cache is kept as a running total, the directory is
+        only scanned when the total passes max_bytes. Entries stored by other
+        processes are counted by that scan.
+
+        Args:
+            key (str): cache key
+            source (str): path of the rendered image
+        """
+        cached = self.path(key, os.path.splitext(source)[1])
+        temp = cached + f".{os.getpid()}.tmp"
+        shutil.copyfile(source, temp)
+        os.replace(temp, cached)
+        if self.size is not None:
+            self.size += os.path.getsize(source)
+        if self.size is None or self.size > self.max_bytes:
+            self.evict()
+
+    def evict(self) -> None:
+        """Removes the least recently used images until the cache fits into max_bytes
+
+        Entries removed by another process while the directory is scanned are skipped.
+        """
+        entries = list()
+        total = 0
+        for entry in os.scandir(self.directory):
+            if entry.is_file() and not entry.name.endswith(".tmp"):
+                try:
+                    stat = entry.stat()
+                except FileNotFoundError:
+                    continue
+                entries.append((stat.st_mtime, stat.st_size, entry.path))
+                total += stat.st_size
+
+        entries.sort()
+        for mtime, size, path in entries:
+            if total <= self.max_bytes:
+                break
+            try:
+                os.remove(path)
+            except FileNotFoundError:
+                pass
+            total -= size
+        self.size = total
+
+    def stats(self) -> dict:
+        """Returns the cache counters
+
+        Returns:
+            dict: hits and misses
+        """
+        return {"hits": self.hits, "misses": self.misses}
+
+
+def find_fonts(settings) -> list:
+    """Collects every "font" path referenced by the settings
+
+    Args:
+        settings: settings or a part of them
+
+    Returns:
+        list: font paths
+    """
+    fonts = list()
+    if isinstance(settings, dict):
+        for key, value in settings.items():
+            if key == "font" and isinstance(value, str):
+                fonts.append(value)
+            else:
+                fonts.extend(find_fonts(value))
+    elif isinstance(settings, list):
+        for value in settings:
+            fonts.extend(find_fonts(value))
+    return fonts
+
+
+caches: dict = dict()
+
+
+def open_cache(directory: str, max_bytes: int = 1024 ** 3) -> RenderCache:
+    """Returns the cache for the directory, reusing it between renders of the same process
+
+    Args:
+        directory (str): where cached images are kept
+        max_bytes (int): total size of cached images
+
+    Returns:
+        RenderCache: cache for the directory
+    """
+    cache = caches.get(directory)
+    if cache is None:
+        cache = RenderCache(directory, max_bytes)
+        caches[directory] = cache
+    cache.max_bytes = max_bytes
+    return cache
@@ -0,0 +1,307 @@
+from http.server import BaseHTTPRequestHandler, ThreadingHTTPServer
+from collections import deque
+from urllib.parse import parse_qs, urlparse
+import argparse
+import io
+import json
+import os
+import socketserver
+import threading
+import time
+
+from api import encode_image, layout_page, pillow_format
+from fonts import get_font
+from raster import rasterize
+from stats import stats
+from vector import layout_to_svg
+
+MAX_BODY_BYTES = 64 * 1024 ** 2
+PERCENTILES = (50, 90, 95, 99)
+
+
+def create_console_args() -> argparse.Namespace:
+    """Creates an interface for requesting arguments from the console
+
+    Returns:
+        argparse.Namespace: entered arguments
+    """
+    parser = argparse.ArgumentParser(
+        description="Render contents pages over HTTP, keeping fonts and measurements cached between requests")
+    parser.add_argument('--host', default="127.0.0.1",
+                        help="Address to listen on", type=str)
+    parser.add_argument("-p", '--port', default=8080,
+                        help="Port to listen on", type=int)
+    parser.add_argument('--socket',
+                        help="Listen on this unix socket instead of a port", type=str)
+    parser.add_argument("-s", '--settings',
+                        help="Path to json with settings used by requests without their own, its fonts are loaded at start", type=str)
+    parser.add_argument('--max-concurrent', default=4,
+                        help="Requests handled at once, the rest are rejected with 503", type=int)
+    parser.add_argument('--quiet', action="store_true",
+                        help="Do not log requests")
+    return parser.parse_args()
+
+
+def warm_up(settings: dict) -> int:
+    """Loads every font of the settings at its largest and smallest size
+
+    Args:
+        settings (dict): page generation settings
+
+    Returns:
+        int: number of loaded fonts
+    """
+    loaded = 0
+    sections = [settings.get("title"), settings.get("subtitle")] + list(settings.get("content", {}).values())
+    for section in sections:
+        if isinstance(section, dict) and section.get("font"):
+            for size in {section["font_size"], section.get("min_font_size", section["font_size"])}:
+                get_font(section["font"], size)
+                loaded += 1
+    return loaded
+
+
+class RenderServer():
+
+    def __init__(self, settings: dict = None, max_concurrent: int = 4, window: int = 1000):
+        """Renders pages for the request handlers and keeps the latency and rejection counters
+
+        Fonts, measurements and glyphs live in module caches that are not
+        thread safe, so layout and rasterization run one request at a time.
+        Encoding runs outside the lock, Pillow releases the GIL while it encodes.
+
+        Args:
+            settings (dict, optional): settings for requests without their own
+            max_concurrent (int): requests handled at once, including the ones waiting for the render lock
+            window (int): how many recent latencies the percentiles are taken from
+        """
+        self.settings: dict = settings
+        self.max_concurrent: int = max_concurrent
+        self.slots = threading.BoundedSemaphore(max_concurrent)
+        self.render_lock = threading.Lock()
+        self.counters_lock = threading.Lock()
+        self.latencies: deque = deque(maxlen=window)
+        self.started: float = time.time()
+        self.requests: int = 0
+        self.rejected: int = 0
+        self.errors: int = 0
+        self.in_flight: int = 0
+
+    def acquire(self) -> bool:
+        """Takes a request slot
+
+        Returns:
+            bool: False if every slot is busy and the request has to be rejected
+        """
+        if not self.slots.acquire(blocking=False):
+            with self.counters_lock:
+                self.rejected += 1
+            return False
+        with self.counters_lock:
+            self.in_flight += 1
+        return True
+
+    def release(self, seconds: float, failed: bool) -> None:
+        """Gives the request slot back and records the latency
+
+        Args:
+            seconds (float): time spent on the request
+            failed (bool): if the request ended with an error
+        """
+        with self.counters_lock:
+            self.in_flight -= 1
+            self.requests += 1
+            if failed:
+                self.errors += 1
+            else:
+                self.latencies.append(seconds)
+        self.slots.release()
+
+    def render(self, request: dict) -> tuple:
+        """Renders a page from a request
+
+        Args:
+            request (dict): "content" ({"title", "chapters"}), optional "settings",
+                "format" (png by default, svg for the vector backend) and Pillow save "options"
+
+        Returns:
+            tuple: (encoded page, content type)
+        """
+        settings: dict = request.get("settings") or self.settings
+        if settings is None:
+            raise ValueError("no settings in the request and the server has no default settings")
+        image_format: str = request.get("format", "png").lower()
+        if image_format != "svg":
+            pillow_format(image_format)
+
+        with self.render_lock:
+            layout = layout_page(request["content"], settings)
+            if image_format == "svg":
+                return layout_to_svg(layout).encode("utf-8"), "image/svg+xml"
+            img = rasterize(layout)
+
+        buffer = io.BytesIO()
+        content_type = encode_image(img, buffer, image_format, **request.get("options", {}))
+        return buffer.getvalue(), content_type
+
+    def percentiles(self) -> dict:
+        """Returns the latency percentiles of the recent requests
+
+        Returns:
+            dict: "p50", "p90", ... in milliseconds, None before the first request
+        """
+        with self.counters_lock:
+            latencies = sorted(self.latencies)
+        result = dict()
+        for percentile in PERCENTILES:
+            if latencies:
+                rank = max(0, min(len(latencies) - 1, -(-percentile * len(latencies) // 100) - 1))
+                result[f"p{percentile}"] = round(latencies[rank] * 1000, 3)
+            else:
+                result[f"p{percentile}"] = None
+        return result
+
+    def report(self) -> dict:
+        """Returns the server counters, latency percentiles and cache counters
+
+        Returns:
+            dict: report
+        """
+        with self.counters_lock:
+            counters = {"uptime": round(time.time() - self.started, 3), "requests": self.requests,
+                        "rejected": self.rejected, "errors": self.errors, "in_flight": self.in_flight,
+                        "max_concurrent": self.max_concurrent, "window": len(self.latencies)}
+        counters["latency_ms"] = self.percentiles()
+        counters["caches"] = stats.cache_counters()
+        return counters
+
+
+class RequestHandler(BaseHTTPRequestHandler):
+    """POST /render renders a page, GET /stats returns the counters, GET /health answers ok"""
+
+    server_version = "TocRender/1.0"
+    protocol_version = "HTTP/1.1"
+
+    def address_string(self) -> str:
+        return self.client_address[0] if self.client_address else "unix"
+
+    def log_message(self, format: str, *args) -> None:
+        if not self.server.quiet:
+            super().log_message(format, *args)
+
+    def send_body(self, status: int, body: bytes, content_type: str, headers: dict = None) -> None:
+        """Sends a complete response
+
+        Args:
+            status (int): HTTP status
+            body (bytes): response body
+            content_type (str): Content-Type of the body
+            headers (dict, optional): additional headers
+        """
+        self.send_response(status)
+        self.send_header("Content-Type", content_type)
+        self.send_header("Content-Length", str(len(body)))
+        for name, value in (headers or {}).items():
+            self.send_header(name, value)
+        self.end_headers()
+        self.wfile.write(body)
+
+    def send_json(self, status: int, data: dict, headers: dict = None) -> None:
+        self.send_body(status, json.dumps(data, ensure_ascii=False).encode("utf-8"), "application/json", headers)
+
+    def do_GET(self) -> None:
+        path = urlparse(self.path).path
+        if path == "/stats":
+            self.send_json(200, self.server.renderer.report())
+        elif path == "/health":
+            self.send_json(200, {"status": "ok"})
+        else:
+            self.send_json(404, {"error": f"unknown path: {path}"})
+
+    def do_POST(self) -> None:
+        url = urlparse(self.path)
+        if url.path != "/render":
+            self.send_json(404, {"error": f"unknown path: {url.path}"})
+            return
+        length = int(self.headers.get("Content-Length") or 0)
+        if length > MAX_BODY_BYTES:
+            self.close_connection = True
+            self.send_json(413, {"error": f"request body is larger than {MAX_BODY_BYTES} bytes"})
+            return
+        body = self.rfile.read(length)
+
+        renderer: RenderServer = self.server.renderer
+        if not renderer.acquire():
+            self.send_json(503, {"error": "too many concurrent requests"}, {"Retry-After": "1"})
+            return
+
+        started = time.perf_counter()
+        failed = True
+        try:
+            request: dict = json.loads(body)
+            query = parse_qs(url.query)
+            if "format" in query:
+                request["format"] = query["format"][0]
+            data, content_type = renderer.render(request)
+            failed = False
+        except (ValueError, KeyError, TypeError) as error:
+            status, message = 400, f"{type(error).__name__}: {error}"
+        except Exception as error:
+            status, message = 500, f"{type(error).__name__}: {error}"
+        finally:
+            seconds = time.perf_counter() - started
+            renderer.release(seconds, failed)
+
+        if failed:
+            self.send_json(status, {"error": message})
+        else:
+            self.send_body(200, data, content_type, {"X-Render-Seconds": f"{seconds:.6f}"})
+
+
+class UnixHTTPServer(socketserver.ThreadingUnixStreamServer):
+    daemon_threads = True
+
+
+def create_server(renderer: RenderServer, host: str = "127.0.0.1", port: int = 8080, socket_path: str = None,
+                  quiet: bool = False):
+    """Creates the HTTP server on a port or a unix socket
+
+    Args:
+        renderer (RenderServer): renders the pages
+        host (str): address to listen on
+        port (int): port to listen on
+        socket_path (str, optional): unix socket to listen on instead of the port
+        quiet (bool): do not log requests
+
+    Returns:
+        server ready for serve_forever()
+    """
+    if socket_path:
+        if os.path.exists(socket_path):
+            os.remove(socket_path)
+        server = UnixHTTPServer(socket_path, RequestHandler)
+    else:
+        server = ThreadingHTTPServer((host, port), RequestHandler)
+    server.renderer = renderer
+    server.quiet = quiet
+    return server
+
+
+if __name__ == "__main__":
+    args = create_console_args()
+    settings = None
+    if args.settings:
+        with open(args.settings, "r", encoding="utf-8") as f:
+            settings = json.loads(f.read())
+        print(f"Loaded {warm_up(settings)} fonts")
+
+    server = create_server(RenderServer(settings, args.max_concurrent), args.host, args.port, args.socket, args.quiet)
+    print(f"Listening on {args.socket or f'http://{args.host}:{args.port}'}")
+    try:
+        server.serve_forever()
+    except KeyboardInterrupt:
+        pass
+    finally:
+        server.server_close()
+        if args.socket and os.path.exists(args.socket):
+            os.remove(args.socket)
@@ -0,0 +1,194 @@
+import functools
+import time
+
+from atlas import glyph_atlas
+from fitting import font_fitter
+from fonts import font_registry
+from metrics import text_metrics
+from wrapping import line_breaker
+
+
+class Phase():
+
+    def __init__(self, stats: "Stats", name: str):
+        """Context manager adding its wall time to a phase of the report
+
+        Args:
+            stats (Stats): where the time goes
+            name (str): name of the phase
+        """
+        self.stats: Stats = stats
+        self.name: str = name
+
+    def __enter__(self):
+        self.started = time.perf_counter()
+        return self
+
+    def __exit__(self, *exc):
+        self.stats.add_phase(self.name, time.perf_counter() - self.started)
+        return False
+
+
+class NullPhase():
+    """Does nothing, returned while the stats are disabled"""
+
+    def __enter__(self):
+        return self
+
+    def __exit__(self, *exc):
+        return False
+
+
+NULL_PHASE = NullPhase()
+
+
+class Stats():
+
+    def __init__(self):
+        """Opt-in timings and counters of a render. Costs one attribute check while disabled
+        """
+        self.enabled: bool = False
+        self.hooks: list = list()
+        self.reset()
+
+    def reset(self) -> None:
+        """Forgets everything recorded so far
+        """
+        self.phases: dict = dict()
+        self.calls: dict = dict()
+        self.chapter_probes: dict = dict()
+        self.caches: dict = self.cache_counters()
+
+    def start(self) -> None:
+        """Starts recording a new report
+        """
+        self.reset()
+        self.enabled = True
+
+    def stop(self) -> dict:
+        """Stops recording and passes the report to every hook
+
+        Returns:
+            dict: report
+        """
+        report = self.report()
+        self.enabled = False
+        for hook in self.hooks:
+            hook(report)
+        return report
+
+    def cancel(self) -> None:
+        """Stops recording without a report, e.g. after a failed render
+        """
+        self.enabled = False
+
+    def phase(self, name: str):
+        """Times a block of code
+
+        Args:
+            name (str): name of the phase
+
+        Returns:
+            context manager
+        """
+        if not self.enabled:
+            return NULL_PHASE
+        return Phase(self, name)
+
+    def add_phase(self, name: str, seconds: float) -> None:
+        """Adds wall time to a phase
+
+        Args:
+            name (str): name of the phase
+            seconds (float): wall time
+        """
+        self.phases[name] = self.phases.get(name, 0) + seconds
+        self.calls[name] = self.calls.get(name, 0) + 1
+
+    def count_probes(self, chapter: int, probes: int) -> None:
+        """Records how many font sizes resize() tried for a chapter
+
+        Args:
+            chapter (int): index of the chapter
+            probes (int): measured font sizes
+        """
+        self.chapter_probes[chapter] = self.chapter_probes.get(chapter, 0) + probes
+
+    def cache_counters(self) -> dict:
+        """Reads the counters of the font, metrics, fitting, glyph and wrapping caches
+
+        Returns:
+            dict: counters of every cache
+        """
+        return {"fonts": font_registry.stats(), "metrics": text_metrics.stats(), "fitting": font_fitter.stats(),
+                "atlas": glyph_atlas.stats(), "wrapping": line_breaker.stats()}
+
+    def report(self) -> dict:
+        """Builds the report of everything recorded since start()
+
+        Returns:
+            dict: phases, counters and per-chapter resize() probes
+        """
+        now = self.cache_counters()
+        counters = dict()
+        counters["font_loads"] = now["fonts"]["misses"] - self.caches["fonts"]["misses"]
+        counters["getmask_calls"] = now["metrics"]["misses"] - self.caches["metrics"]["misses"] + \
+            now["atlas"]["misses"] - self.caches["atlas"]["misses"] + \
+            now["atlas"]["fallbacks"] - self.caches["atlas"]["fallbacks"]
+        counters["resize_probes"] = now["fitting"]["probes"] - self.caches["fitting"]["probes"] + \
+            now["wrapping"]["probes"] - self.caches["wrapping"]["probes"]
+        caches = dict()
+        for name in now:
+            caches[name] = {"hits": now[name]["hits"] - self.caches[name]["hits"],
+                            "misses": now[name]["misses"] - self.caches[name]["misses"]}
+        return {"phases": {name: {"seconds": seconds, "calls": self.calls[name]}
+                           for name, seconds in self.phases.items()},
+                "counters": counters,
+                "caches": caches,
+                "resize_probes_per_chapter": [self.chapter_probes.get(chapter, 0)
+                                              for chapter in range(max(self.chapter_probes, default=-1) + 1)]}
+
+
+stats = Stats()
+
+
+def timed(name: str):
+    """Decorator timing every call of a method as a phase while the stats are enabled
+
+    Args:
+        name (str): name of the phase
+    """
+    def decorator(method):
+        @functools.wraps(method)
+        def wrapper(*args, **kwargs):
+            if not stats.enabled:
+                return method(*args, **kwargs)
+            with Phase(stats, name):
+                return method(*args, **kwargs)
+        return wrapper
+    return decorator
+
+
+def merge_reports(reports: list) -> dict:
+    """Sums the reports of many renders, e.g. of a batch
+
+    Args:
+        reports (list): reports from Stats.stop
+
+    Returns:
+        dict: summed phases, counters and cache counters and the number of renders
+    """
+    merged = {"renders": 0, "phases": dict(), "counters": dict(), "caches": dict()}
+    for report in reports:
+        merged["renders"] += 1
+        for name, phase in report["phases"].items():
+            total = merged["phases"].setdefault(name, {"seconds": 0, "calls": 0})
+            total["seconds"] += phase["seconds"]
+            total["calls"] += phase["calls"]
+        for name, value in report["counters"].items():
+            merged["counters"][name] = merged["counters"].get(name, 0) + value
+        for name, cache in report["caches"].items():
+            total = merged["caches"].setdefault(name, {"hits": 0, "misses": 0})
+            total["hits"] += cache["hits"]
+            total["misses"] += cache["misses"]
+    return merged
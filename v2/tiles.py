@@ -0,0 +1,267 @@
+from PIL import Image, ImageDraw
+from multiprocessing import shared_memory
+import multiprocessing
+
+from fonts import get_font
+from layout import Layout, TextRun
+from metrics import MULTILINE_SPACING
+from raster import rasterize
+
+MIN_TILED_PIXELS = 4000000
+
+measure_draw = ImageDraw.Draw(Image.new("RGB", (1, 1)))
+
+
+def run_box(run: TextRun) -> tuple:
+    """Returns the box a run paints
+
+    Args:
+        run (TextRun): text run
+
+    Returns:
+        tuple: (left, top, right, bottom)
+    """
+    font = get_font(*run.font)
+    if run.multiline:
+        return measure_draw.multiline_textbbox(run.xy, run.text, font=font, align=run.align)
+    return measure_draw.textbbox(run.xy, run.text, font=font)
+
+
+def crop_layout(layout: Layout, box: tuple, run_boxes: list) -> Layout:
+    """Cuts the part of a layout inside a box, moving the runs into the coordinates of the box
+
+    Runs crossing the edge are kept whole, drawing them on both sides
+    paints the same pixels a single draw would.
+
+    Args:
+        layout (Layout): layout of the page
+        box (tuple): (left, top, right, bottom)
+        run_boxes (list): boxes of the layout runs from run_box
+
+    Returns:
+        Layout: layout of the box
+    """
+    left, top, right, bottom = box
+    runs = list()
+    for run, (run_left, run_top, run_right, run_bottom) in zip(layout.runs, run_boxes):
+        if run_right > left and run_left < right and run_bottom > top and run_top < bottom:
+            runs.append(run._replace(xy=(run.xy[0] - left, run.xy[1] - top)))
+    return Layout((right - left, bottom - top), layout.color, runs)
+
+
+def run_rows(run: TextRun) -> tuple:
+    """Returns rows a run may paint, a cheap overestimate of its box from the font metrics
+
+    Args:
+        run (TextRun): text run
+
+    Returns:
+        tuple: (top, bottom)
+    """
+    font = get_font(*run.font)
+    ascent, descent = font.getmetrics()
+    lines = run.text.count("\n") if run.multiline else 0
+    if lines:
+        lines *= font.getbbox("A")[3] + MULTILINE_SPACING
+    return (run.xy[1] - font.size, run.xy[1] + lines + ascent + descent + font.size)
+
+
+def band_edges(height: int, bands: int) -> list:
+    """Splits the rows of a canvas into horizontal bands of about the same height
+
+    Args:
+        height (int): height of the canvas
+        bands (int): number of bands
+
+    Returns:
+        list: top of every band and the bottom of the last one
+    """
+    bands = max(1, min(bands, height))
+    return [round(height * number / bands) for number in range(bands + 1)]
+
+
+def rasterize_band(task: tuple) -> None:
+    """Draws one band in a worker process straight into the shared pixels of the page
+
+    Args:
+        task (tuple): (name of the shared memory block, offset of the band in bytes, layout of the band)
+    """
+    name, offset, layout = task
+    block = shared_memory.SharedMemory(name)
+    try:
+        pixels = rasterize(layout).tobytes()
+        block.buf[offset:offset + len(pixels)] = pixels
+    finally:
+        block.close()
+
+
+def split_bands(layout: Layout, processes: int, bands: int = None) -> list:
+    """Splits a laid out page into horizontal bands with the runs each of them paints
+
+    Args:
+        layout (Layout): layout from PageLayout.layout_page
+        processes (int): number of worker processes
+        bands (int, optional): number of bands, twice the processes by default so dense and sparse bands even out
+
+    Returns:
+        list: Layout of every band from the top, or None if the page is drawn in one piece
+    """
+    if processes <= 1 or layout.size[0] * layout.size[1] < MIN_TILED_PIXELS:
+        return None
+
+    width, height = layout.size
+    rows = [run_rows(run) for run in layout.runs]
+    edges = band_edges(height, bands or processes * 2)
+    band_layouts = list()
+    for top, bottom in zip(edges, edges[1:]):
+        runs = [run._replace(xy=(run.xy[0], run.xy[1] - top))
+                for run, (run_top, run_bottom) in zip(layout.runs, rows) if run_bottom > top and run_top < bottom]
+        band_layouts.append(Layout((width, bottom - top), layout.color, runs))
+    return band_layouts
+
+
+class TiledRasterizer():
+
+    def __init__(self, processes: int, bands: int = None):
+        """Draws pages as bands on one pool of worker processes, shared by every page of a render
+
+        The pool is started by the first page large enough to be split, so
+        renders of small pages never start workers, and paginated renders
+        pay the start-up once instead of once per page.
+
+        Args:
+            processes (int): number of worker processes
+            bands (int, optional): number of bands per page, twice the processes by default
+        """
+        self.processes: int = processes
+        self.bands: int = bands
+        self.pool = None
+
+    def __enter__(self):
+        return self
+
+    def __exit__(self, *exc):
+        self.close()
+        return False
+
+    def draw_bands(self, size: tuple, band_layouts: list) -> shared_memory.SharedMemory:
+        """Draws the bands on the pool into one shared memory block, starting the pool if needed
+
+        Workers write the rows of their band at its offset, so the pixels
+        are neither pickled back nor joined. The block is created before the
+        pool, so the workers share the resource tracker of this process and
+        leave the removal of the block to it.
+
+        Args:
+            size (tuple): size of the page
+            band_layouts (list): bands from split_bands
+
+        Returns:
+            shared_memory.SharedMemory: block with the raw RGB pixels of the page, closed and unlinked by the caller
+        """
+        row = size[0] * 3
+        block = shared_memory.SharedMemory(create=True, size=max(1, row * size[1]))
+        tasks = list()
+        offset = 0
+        for band in band_layouts:
+            tasks.append((block.name, offset, band))
+            offset += row * band.size[1]
+        try:
+            if self.pool is None:
+                self.pool = multiprocessing.Pool(self.processes)
+            for _ in self.pool.imap_unordered(rasterize_band, tasks):
+                pass
+        except BaseException:
+            release(block)
+            raise
+        return block
+
+    def rasterize_raw(self, layout: Layout) -> bytes:
+        """Draws a laid out page and returns its raw pixels without building an image of the page
+
+        Args:
+            layout (Layout): layout from PageLayout.layout_page
+
+        Returns:
+            bytes: raw RGB pixels, row by row
+        """
+        band_layouts = split_bands(layout, self.processes, self.bands)
+        if band_layouts is None:
+            return rasterize(layout).tobytes()
+        block = self.draw_bands(layout.size, band_layouts)
+        try:
+            return bytes(block.buf[:layout.size[0] * layout.size[1] * 3])
+        finally:
+            release(block)
+
+    def rasterize(self, layout: Layout) -> Image.Image:
+        """Draws a laid out page, the same pixels rasterize() draws
+
+        Args:
+            layout (Layout): layout from PageLayout.layout_page
+
+        Returns:
+            Image.Image: The image object
+        """
+        band_layouts = split_bands(layout, self.processes, self.bands)
+        if band_layouts is None:
+            return rasterize(layout)
+        block = self.draw_bands(layout.size, band_layouts)
+        try:
+            return Image.frombytes("RGB", layout.size, block.buf)
+        finally:
+            release(block)
+
+    def close(self) -> None:
+        """Stops the worker processes
+        """
+        if self.pool is not None:
+            self.pool.close()
+            self.pool.join()
+            self.pool = None
+
+
+def release(block: shared_memory.SharedMemory) -> None:
+    """Closes and removes a shared memory block
+
+    Args:
+        block (shared_memory.SharedMemory): block from TiledRasterizer.draw_bands
+    """
+    block.close()
+    block.unlink()
+
+
+def rasterize_tiled_raw(layout: Layout, processes: int, bands: int = None) -> bytes:
+    """Draws a laid out page like rasterize_tiled and returns its raw pixels without building an image of the page
+
+    Args:
+        layout (Layout): layout from PageLayout.layout_page
+        processes (int): number of worker processes
+        bands (int, optional): number of bands
+
+    Returns:
+        bytes: raw RGB pixels, row by row
+    """
+    with TiledRasterizer(processes, bands) as rasterizer:
+        return rasterizer.rasterize_raw(layout)
+
+
+def rasterize_tiled(layout: Layout, processes: int, bands: int = None) -> Image.Image:
+    """Draws a laid out page as horizontal bands on a pool of worker processes and stitches them together
+
+    Bands span the whole width, so every worker writes its rows into one
+    shared block of the page. Pages smaller than MIN_TILED_PIXELS, or a
+    single process, are drawn by rasterize() directly since starting
+    workers costs more than it saves. Renders of several pages should share
+    one TiledRasterizer instead.
+
+    Args:
+        layout (Layout): layout from PageLayout.layout_page
+        processes (int): number of worker processes
+        bands (int, optional): number of bands, twice the processes by default so dense and sparse bands even out
+
+    Returns:
+        Image.Image: The image object, the same pixels rasterize() draws
+    """
+    with TiledRasterizer(processes, bands) as rasterizer:
+        return rasterizer.rasterize(layout)
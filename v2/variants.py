@@ -0,0 +1,84 @@
+from PIL import Image
+from concurrent.futures import ThreadPoolExecutor
+import os
+import time
+
+FORMAT_EXTENSIONS = {"JPEG": ".jpg", "WEBP": ".webp", "PNG": ".png", "AVIF": ".avif", "TIFF": ".tiff"}
+SAVE_OPTIONS = ("quality", "progressive", "optimize", "lossless", "method", "compress_level", "subsampling")
+
+
+def variant_path(destination: str, variant: dict) -> str:
+    """Returns where a variant is saved: the destination with the suffix and the extension of the variant format
+
+    Args:
+        destination (str): path of the image
+        variant (dict): variant settings
+
+    Returns:
+        str: path of the variant
+    """
+    root, extension = os.path.splitext(destination)
+    if variant.get("format"):
+        extension = FORMAT_EXTENSIONS.get(variant["format"].upper(), "." + variant["format"].lower())
+    return root + variant.get("suffix", "") + extension
+
+
+def page_path(destination: str, number: int) -> str:
+    """Returns where a page of the paginated mode is saved: name_001.ext, name_002.ext, ...
+
+    Args:
+        destination (str): path of the image
+        number (int): page number, starting from 1
+
+    Returns:
+        str: path of the page
+    """
+    root, extension = os.path.splitext(destination)
+    return f"{root}_{number:03d}{extension}"
+
+
+def save_variant(img: Image.Image, path: str, variant: dict) -> dict:
+    """Downscales the page if the variant has a width and encodes it
+
+    A full-size variant is encoded from a copy of the page. Image.save
+    keeps its options on the image, so variants saved from one image on
+    several threads would mix up their quality and other options.
+
+    Args:
+        img (Image.Image): rendered page
+        path (str): where to save
+        variant (dict): variant settings: format, suffix, width and Pillow save options
+
+    Returns:
+        dict: path, size, encoded bytes and seconds spent
+    """
+    started = time.perf_counter()
+    if variant.get("width") and variant["width"] < img.size[0]:
+        height = max(1, round(img.size[1] * variant["width"] / img.size[0]))
+        img = img.resize((variant["width"], height), Image.Resampling.LANCZOS, reducing_gap=3.0)
+    else:
+        img = img.copy()
+    options = {key: variant[key] for key in SAVE_OPTIONS if key in variant}
+    options.update(variant.get("options", {}))
+    img.save(path, format=variant.get("format"), **options)
+    return {"path": path, "size": list(img.size), "bytes": os.path.getsize(path),
+            "seconds": time.perf_counter() - started}
+
+
+def save_variants(img: Image.Image, destination: str, variants: list, threads: int = None) -> list:
+    """Encodes every variant of the page on a thread pool, Pillow releases the GIL while resizing and encoding
+
+    Args:
+        img (Image.Image): rendered page
+        destination (str): path of the image
+        variants (list): variant settings
+        threads (int, optional): number of threads, one per variant by default
+
+    Returns:
+        list: results of save_variant in the order of the variants
+    """
+    img.load()
+    with ThreadPoolExecutor(max_workers=threads or len(variants)) as pool:
+        futures = [pool.submit(save_variant, img, variant_path(destination, variant), variant)
+                   for variant in variants]
+        return [future.result() for future in futures]
@@ -0,0 +1,122 @@
+from xml.sax.saxutils import escape
+import base64
+import io
+import os
+
+from fonts import get_font
+from layout import Layout
+from metrics import MULTILINE_SPACING
+
+try:
+    from fontTools import subset
+    from fontTools.ttLib import TTFont
+except ImportError:
+    subset = None
+FONT_FORMATS = {".otf": ("font/otf", "opentype"), ".ttf": ("font/ttf", "truetype"),
+                ".woff": ("font/woff", "woff"), ".woff2": ("font/woff2", "woff2")}
+
+font_files: dict = dict()
+
+
+def font_data(path: str, characters: str) -> bytes:
+    """Returns the font file to embed, subset to the used characters if fontTools is installed
+
+    Args:
+        path (str): path to the font file
+        characters (str): characters drawn with the font
+
+    Returns:
+        bytes: font file
+    """
+    if subset is not None:
+        options = subset.Options()
+        options.name_IDs = ["*"]
+        font = TTFont(path)
+        subsetter = subset.Subsetter(options)
+        subsetter.populate(text=characters)
+        subsetter.subset(font)
+        buffer = io.BytesIO()
+        font.save(buffer)
+        return buffer.getvalue()
+
+    data = font_files.get(path)
+    if data is None:
+        with open(path, "rb") as f:
+            data = f.read()
+        font_files[path] = data
+    return data
+
+
+def layout_to_svg(layout: Layout) -> str:
+    """Turns a laid out page into SVG with the fonts embedded, without rasterizing it
+
+    Text is placed the way Pillow places it: xy is the left end of the
+    ascender line, wrapped lines are getbbox("A") + 4 px apart and
+    aligned by their advance width.
+
+    Args:
+        layout (Layout): layout from PageLayout
+
+    Returns:
+        str: SVG document
+    """
+    families: dict = dict()
+    characters: dict = dict()
+    for run in layout.runs:
+        path = run.font[0]
+        if path not in families:
+            families[path] = f"f{len(families)}"
+            characters[path] = set()
+        characters[path].update(run.text.replace("\n", ""))
+
+    width, height = layout.size
+    parts = [f'<svg xmlns="http://www.w3.org/2000/svg" width="{width}" height="{height}" '
+             f'viewBox="0 0 {width} {height}">', "<style>"]
+    for path, family in families.items():
+        mime, font_format = FONT_FORMATS.get(os.path.splitext(path)[1].lower(), FONT_FORMATS[".ttf"])
+        data = base64.b64encode(font_data(path, "".join(sorted(characters[path])))).decode("ascii")
+        parts.append(f'@font-face{{font-family:"{family}";src:url(data:{mime};base64,{data}) format("{font_format}");}}')
+    parts.append("</style>")
+    parts.append(f'<rect width="100%" height="100%" fill="{escape(layout.color)}"/>')
+
+    for run in layout.runs:
+        font = get_font(*run.font)
+        ascent = font.getmetrics()[0]
+        lines = run.text.split("\n") if run.multiline else [run.text]
+        line_spacing = font.getbbox("A")[3] + MULTILINE_SPACING
+        widths = [font.getlength(line) for line in lines]
+        x, y = run.xy
+        for number, line in enumerate(lines):
+            left = x
+            if run.align == "right":
+                left += max(widths) - widths[number]
+            elif run.align == "center":
+                left += (max(widths) - widths[number]) / 2
+            parts.append(f'<text x="{left:g}" y="{y + ascent + number * line_spacing:g}" '
+                         f'font-family="{families[run.font[0]]}" font-size="{run.font[1]}" '
+                         f'fill="{escape(run.fill)}" xml:space="preserve">{escape(line)}</text>')
+    parts.append("</svg>")
+    return "\n".join(parts)
+
+
+def is_vector(path: str) -> bool:
+    """Checks if the page should be saved by the vector backend instead of Pillow
+
+    Args:
+        path (str): path of the output
+
+    Returns:
+        bool: True for .svg
+    """
+    return path.lower().endswith(".svg")
+
+
+def write_svg(layout: Layout, path: str) -> None:
+    """Saves a laid out page as SVG
+
+    Args:
+        layout (Layout): layout from PageLayout
+        path (str): where to save
+    """
+    with open(path, "w", encoding="utf-8") as f:
+        f.write(layout_to_svg(layout))
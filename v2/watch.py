@@ -0,0 +1,175 @@
+import json
+import os
+import time
+
+from variants import page_path, variant_path
+from vector import is_vector
+
+
+def file_state(path: str) -> tuple:
+    """Returns what tells that a file changed
+
+    Args:
+        path (str): path to the file
+
+    Returns:
+        tuple: (mtime in ns, size), or None if there is no file
+    """
+    try:
+        stat = os.stat(path)
+    except OSError:
+        return None
+    return (stat.st_mtime_ns, stat.st_size)
+
+
+def job_destination(job: dict) -> str:
+    """Returns the path of the image a job saves
+
+    Args:
+        job (dict): input, settings, output and name
+
+    Returns:
+        str: path of the image
+    """
+    return f"{job['output']}/{job['name']}"
+
+
+def job_outputs(job: dict) -> list:
+    """Returns the paths of the images a job saves, as its settings name them
+
+    Paginated jobs are represented by their first page, jobs with output
+    variants by every variant, since the destination itself is not saved.
+
+    Args:
+        job (dict): input, settings, output and name
+
+    Returns:
+        list: paths of the images
+    """
+    destination = job_destination(job)
+    try:
+        with open(job["settings"], "r", encoding="utf-8") as f:
+            settings: dict = json.loads(f.read())
+    except (OSError, TypeError, ValueError):
+        return [destination]
+    if settings.get("page", {}).get("paginate", False):
+        destination = page_path(destination, 1)
+    if is_vector(destination):
+        return [destination]
+    variants: list = settings.get("output", {}).get("variants", list())
+    return [variant_path(destination, variant) for variant in variants] or [destination]
+
+
+def is_stale(job: dict) -> bool:
+    """Checks if an image of a job is missing or older than its input or settings
+
+    Args:
+        job (dict): input, settings, output and name
+
+    Returns:
+        bool: True if the job has to be rendered
+    """
+    rendered = [file_state(path) for path in job_outputs(job)]
+    if any(state is None for state in rendered):
+        return True
+    oldest = min(state[0] for state in rendered)
+    sources = [file_state(path) for path in (job["input"], job["settings"]) if path]
+    return any(source is not None and source[0] > oldest for source in sources)
+
+
+class Watcher():
+
+    def __init__(self, collect, interval: float = 0.5, debounce: float = 1.0, extra_paths: list = None):
+        """Polls the inputs and settings of the jobs and tells which jobs a change affects
+
+        Polling needs nothing beyond the standard library and behaves the
+        same on network shares, where change notifications are unreliable.
+
+        Args:
+            collect: function returning the current jobs, called on every poll so new files are picked up
+            interval (float): seconds between polls
+            debounce (float): seconds without changes before the affected jobs are rendered
+            extra_paths (list, optional): more files to watch, e.g. a manifest
+        """
+        self.collect = collect
+        self.interval: float = interval
+        self.debounce: float = debounce
+        self.extra_paths: list = extra_paths or list()
+        self.jobs: list = self.collect()
+        self.states: dict = self.snapshot(self.jobs)
+
+    def snapshot(self, jobs: list) -> dict:
+        """Reads the state of every watched file
+
+        Args:
+            jobs (list): jobs from collect
+
+        Returns:
+            dict: path -> file_state
+        """
+        paths = set(self.extra_paths)
+        for job in jobs:
+            paths.add(job["input"])
+            if job["settings"]:
+                paths.add(job["settings"])
+        return {path: file_state(path) for path in paths}
+
+    def poll(self) -> set:
+        """Collects the jobs again and finds the files that changed since the previous poll
+
+        Returns:
+            set: changed, created and removed paths
+        """
+        try:
+            jobs = self.collect()
+        except (OSError, ValueError):
+            return set()
+        states = self.snapshot(jobs)
+        changed = {path for path in states.keys() | self.states.keys()
+                   if states.get(path) != self.states.get(path)}
+        self.jobs, self.states = jobs, states
+        return changed
+
+    def affected(self, changed: set) -> list:
+        """Finds the jobs to render after a change. A settings file affects every job using it
+
+        Args:
+            changed (set): paths from poll
+
+        Returns:
+            list: jobs whose input or settings changed and still exist
+        """
+        if any(path in changed for path in self.extra_paths):
+            return [job for job in self.jobs if is_stale(job)]
+        return [job for job in self.jobs
+                if (job["input"] in changed or job["settings"] in changed) and self.states.get(job["input"])]
+
+    def wait(self) -> list:
+        """Blocks until something changes and the writes settle for the debounce time
+
+        Returns:
+            list: jobs to render
+        """
+        changed = set()
+        quiet_since = None
+        while True:
+            time.sleep(self.interval)
+            new = self.poll()
+            if new:
+                changed |= new
+                quiet_since = time.monotonic()
+            elif changed and time.monotonic() - quiet_since >= self.debounce:
+                jobs = self.affected(changed)
+                if jobs:
+                    return jobs
+                changed = set()
+
+    def run(self, render) -> None:
+        """Renders the stale jobs, then every job affected by a change, until interrupted
+
+        Args:
+            render: function rendering a list of jobs
+        """
+        render([job for job in self.jobs if is_stale(job)])
+        while True:
+            render(self.wait())
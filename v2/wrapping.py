@@ -0,0 +1,235 @@
+from PIL import ImageFont
+from bisect import bisect_left
+from collections import OrderedDict
+
+from fitting import font_fitter
+from fonts import get_font
+from metrics import font_key, text_metrics
+
+WRAP_MODES = ("greedy", "balanced")
+
+
+class LineBreaker():
+
+    def __init__(self, max_entries: int = 50000):
+        """Wraps texts that do not fit into one line at the smallest font size
+
+        Line widths are estimated from prefix sums of word advances and a
+        cached space advance, so finding the lines takes one binary search
+        per line. Only the chosen lines are measured by their ink, the way
+        the fitter measures single lines, and a line whose ink does not fit
+        gives its last word to the next line.
+
+        Args:
+            max_entries (int): how many wrapped texts to keep before evicting the least recently used one
+        """
+        self.max_entries: int = max_entries
+        self.results: OrderedDict = OrderedDict()
+        self.advances: dict = dict()
+        self.hits: int = 0
+        self.misses: int = 0
+        self.probes: int = 0
+
+    def advance(self, word: str, font: ImageFont.FreeTypeFont) -> float:
+        """Returns the advance width of a word
+
+        Args:
+            word (str): word or a space
+            font (ImageFont.FreeTypeFont): font of the word
+
+        Returns:
+            float: advance in pixels
+        """
+        key = (font_key(font), word)
+        advance = self.advances.get(key)
+        if advance is None:
+            advance = self.advances[key] = font.getlength(word)
+        return advance
+
+    def positions(self, words: list, font: ImageFont.FreeTypeFont) -> list:
+        """Returns the prefix sums of word advances with a space after every word
+
+        A line of words[start:end] is positions[end] - positions[start] - space wide.
+
+        Args:
+            words (list): words of the text
+            font (ImageFont.FreeTypeFont): font of the text
+
+        Returns:
+            list: len(words) + 1 positions
+        """
+        space = self.advance(" ", font)
+        positions = [0]
+        for word in words:
+            positions.append(positions[-1] + self.advance(word, font) + space)
+        return positions
+
+    def ink_fits(self, line: str, font: ImageFont.FreeTypeFont, max_width: int) -> bool:
+        """Checks a line by its ink, as the fitter does
+
+        Args:
+            line (str): line of text
+            font (ImageFont.FreeTypeFont): font of the line
+            max_width (int): available width
+
+        Returns:
+            bool: True if it fits
+        """
+        self.probes += 1
+        return max_width > text_metrics.ink_size(line, font)[0]
+
+    def greedy(self, words: list, font: ImageFont.FreeTypeFont, max_width: int) -> list:
+        """Puts as many words into every line as fit, a word too long for any line gets a line of its own
+
+        Args:
+            words (list): words of the text
+            font (ImageFont.FreeTypeFont): font of the text
+            max_width (int): available width
+
+        Returns:
+            list: lines
+        """
+        positions = self.positions(words, font)
+        space = self.advance(" ", font)
+        lines = list()
+        start = 0
+        while start < len(words):
+            end = max(start + 1, bisect_left(positions, positions[start] + max_width + space) - 1)
+            end = min(end, len(words))
+            while end - start > 1 and not self.ink_fits(" ".join(words[start:end]), font, max_width):
+                end -= 1
+            lines.append(" ".join(words[start:end]))
+            start = end
+        return lines
+
+    def balanced(self, words: list, font: ImageFont.FreeTypeFont, max_width: int, count: int) -> list:
+        """Splits the words into count lines with the least raggedness, the sum of squared free space
+
+        Args:
+            words (list): words of the text
+            font (ImageFont.FreeTypeFont): font of the text
+            max_width (int): available width
+            count (int): number of lines
+
+        Returns:
+            list: lines, or None if the words do not fit into count lines
+        """
+        positions = self.positions(words, font)
+        space = self.advance(" ", font)
+        total = len(words)
+        infinity = float("inf")
+        costs = [[infinity] * (total + 1) for _ in range(count + 1)]
+        starts = [[0] * (total + 1) for _ in range(count + 1)]
+        costs[0][0] = 0
+        for line in range(1, count + 1):
+            for end in range(line, total + 1):
+                for start in range(end - 1, line - 2, -1):
+                    width = positions[end] - positions[start] - space
+                    if width >= max_width and end - start > 1:
+                        break
+                    cost = costs[line - 1][start] + (max_width - width) ** 2
+                    if cost < costs[line][end]:
+                        costs[line][end] = cost
+                        starts[line][end] = start
+        if costs[count][total] == infinity:
+            return None
+
+        lines = list()
+        end = total
+        for line in range(count, 0, -1):
+            start = starts[line][end]
+            lines.append(" ".join(words[start:end]))
+            end = start
+        lines.reverse()
+        if not all(self.ink_fits(line, font, max_width) or " " not in line for line in lines):
+            return None
+        return lines
+
+    def fits(self, lines: list, font: ImageFont.FreeTypeFont, max_width: int) -> bool:
+        """Checks if every line fits by its ink
+
+        Args:
+            lines (list): lines from greedy
+            font (ImageFont.FreeTypeFont): font of the lines
+            max_width (int): available width
+
+        Returns:
+            bool: True if all of them fit
+        """
+        return all(self.ink_fits(line, font, max_width) for line in lines)
+
+    def wrap(self, text: str, font_path: str, font_size: int, min_font_size: int, max_width: int,
+             mode: str = "greedy") -> list:
+        """Fits a text into max_width, wrapping it only if it does not fit into one line at any size
+
+        The size and the number of lines are chosen together: the fewest
+        lines the text fits into at the smallest size, then the largest size
+        at which it still fits into that many lines.
+
+        Args:
+            text (str): Text for calculate
+            font_path (str): path to the font file
+            font_size (int): preferred font size
+            min_font_size (int): lower bound of the font size
+            max_width (int): available width
+            mode (str): "greedy" fills every line but the last, "balanced" evens the lines out
+
+        Returns:
+            list: [text with line breaks, font]
+        """
+        text = str(text)
+        font, fits = font_fitter.fit(text, font_path, font_size, min_font_size, max_width)
+        if fits or " " not in text.strip():
+            return [text, font]
+
+        key = (font_path, font_size, min_font_size, text, max_width, mode)
+        result = self.results.get(key)
+        if result is not None:
+            self.hits += 1
+            self.results.move_to_end(key)
+            return [result[0], get_font(font_path, result[1])]
+
+        self.misses += 1
+        words = text.split(" ")
+        smallest: int = font.size
+        lines = self.greedy(words, font, max_width)
+        best, best_lines = smallest, lines
+        low, high = smallest + 1, font_size
+        while low <= high:
+            middle = (low + high) // 2
+            middle_font = get_font(font_path, middle)
+            middle_lines = self.greedy(words, middle_font, max_width)
+            if len(middle_lines) <= len(lines) and self.fits(middle_lines, middle_font, max_width):
+                best, best_lines = middle, middle_lines
+                low = middle + 1
+            else:
+                high = middle - 1
+
+        if mode == "balanced":
+            best_lines = self.balanced(words, get_font(font_path, best), max_width, len(best_lines)) or best_lines
+        result = ("\n".join(best_lines), best)
+        self.results[key] = result
+        if len(self.results) > self.max_entries:
+            self.results.popitem(last=False)
+        return [result[0], get_font(font_path, best)]
+
+    def clear(self) -> None:
+        """Drops every result and resets the counters
+        """
+        self.results.clear()
+        self.advances.clear()
+        self.hits = 0
+        self.misses = 0
+        self.probes = 0
+
+    def stats(self) -> dict:
+        """Returns the cache counters
+
+        Returns:
+            dict: cached results, hits, misses and measured lines
+        """
+        return {"entries": len(self.results), "max_entries": self.max_entries,
+                "hits": self.hits, "misses": self.misses, "probes": self.probes}
+
+
+line_breaker = LineBreaker()